@@ -0,0 +1,120 @@
+# Concurrency check: dashboard read latency while a large upload is being processed
+#
+# Usage (from backend/):  python benchmarks/bench_concurrency.py [--rows 30000] [--max-p95-ms 250] [--other-store]
+# Exits non-zero when the p95 read latency during the upload exceeds --max-p95-ms.
+# With --other-store the reads go to a second store while the upload goes to
+# the default one, as when two shops share the server.
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from synthetic import BACKEND_DIR, write_workbook
+
+READ_PATHS = ['/api/reports/latest', '/api/reports/summary', '/api/credits']
+
+# Seconds between scheduled dashboard reads
+READ_INTERVAL = 0.05
+
+# Store read from with --other-store
+OTHER_STORE = 'bench-other'
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def report(label, samples):
+    print(f"{label:<14} n={len(samples):<5} p50={statistics.median(samples):7.1f}ms  "
+          f"p95={percentile(samples, 95):7.1f}ms  max={max(samples):7.1f}ms")
+
+async def timed_get(client, path, headers):
+    start = time.perf_counter()
+    response = await client.get(path, headers=headers)
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+async def run(args, workdir):
+    import httpx
+    import main as app_main
+
+    path = os.path.join(workdir, 'sheet.xlsx')
+    write_workbook(path, args.rows)
+    with open(path, 'rb') as f:
+        contents = f.read()
+
+    # The seed sheet is for another day, so the measured upload is not a duplicate
+    seed_path = os.path.join(workdir, 'seed.xlsx')
+    write_workbook(seed_path, args.rows, seed=1, day='31-03-24')
+    with open(seed_path, 'rb') as f:
+        seed_contents = f.read()
+
+    read_headers = {'X-Store': OTHER_STORE} if args.other_store else {}
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.lifespan(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            # Seed some data so the reads have something to aggregate
+            seed = await client.post('/api/upload', files={'file': ('seed.xlsx', seed_contents)}, headers=read_headers)
+            seed.raise_for_status()
+
+            idle = [await timed_get(client, READ_PATHS[i % len(READ_PATHS)], read_headers) for i in range(60)]
+
+            # Issue reads on a fixed schedule and measure from the scheduled time,
+            # so reads held up by a blocked event loop count as slow
+            upload_done = asyncio.Event()
+
+            async def scheduled_get(scheduled, path):
+                response = await client.get(path, headers=read_headers)
+                response.raise_for_status()
+                return (time.perf_counter() - scheduled) * 1000
+
+            async def reader():
+                start = time.perf_counter()
+                reads = []
+                while not upload_done.is_set():
+                    scheduled = start + len(reads) * READ_INTERVAL
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    path = READ_PATHS[len(reads) % len(READ_PATHS)]
+                    reads.append(asyncio.create_task(scheduled_get(scheduled, path)))
+                return await asyncio.gather(*reads)
+
+            reading = asyncio.create_task(reader())
+            await asyncio.sleep(READ_INTERVAL)
+
+            upload_start = time.perf_counter()
+            response = await client.post('/api/upload', files={'file': ('sheet.xlsx', contents)})
+            upload_seconds = time.perf_counter() - upload_start
+            upload_done.set()
+            during = await reading
+            response.raise_for_status()
+
+    print(f"upload of {args.rows} rows took {upload_seconds:.2f}s")
+    report('idle reads', idle)
+    report('during upload', during)
+    return percentile(during, 95)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure read latency while an upload runs')
+    parser.add_argument('--rows', type=int, default=30_000)
+    parser.add_argument('--max-p95-ms', type=float, default=None)
+    parser.add_argument('--other-store', action='store_true', help='read from another store than the one uploaded to')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='credit-bench-')
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    if args.other_store:
+        os.environ['CREDIT_STORES'] = OTHER_STORE
+
+    p95 = asyncio.run(run(args, workdir))
+    if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+        print(f"FAIL: p95 {p95:.1f}ms exceeds {args.max_p95_ms:.1f}ms")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# Response encoding benchmark: payload size and the time to serialize and
+# compress the largest responses, rows against columnar, FastAPI's default
+# encoder against the app's
+#
+# Usage (from backend/):  python benchmarks/bench_encoding.py [--customers 2000] [--days 365] [--rows-per-day 200]
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from synthetic import BACKEND_DIR, seed_ledger
+
+PAYLOAD_ENDPOINTS = [
+    '/api/transactions?limit=1000',
+    '/api/transactions?limit=1000&format=columnar',
+    '/api/reports/daily',
+    '/api/reports/daily?format=columnar',
+    '/api/reports/charts',
+    '/api/dashboard',
+]
+
+# Median milliseconds of several calls
+def timed_ms(call, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+# What FastAPI does with a plain return value: jsonable_encoder, then JSONResponse.render
+def default_encode(content):
+    from fastapi.encoders import jsonable_encoder
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def encode_payload(app_main, content, runs):
+    body = app_main.dump_json(content)
+    result = {
+        "bytes": len(body),
+        "default_encode_ms": timed_ms(lambda: default_encode(content), runs),
+        "encode_ms": timed_ms(lambda: app_main.dump_json(content), runs),
+        "serializer": "orjson" if app_main.orjson is not None else "json"
+    }
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and app_main.brotli is None:
+            continue
+        def compress():
+            compress_chunk, finish = app_main.open_compressor(encoding)
+            return compress_chunk(body) + finish()
+        result[f"{encoding}_bytes"] = len(compress())
+        result[f"{encoding}_ms"] = timed_ms(compress, runs)
+    return result
+
+# Encoding figures per endpoint, from bodies fetched through client
+async def measure_encoding(app_main, client, runs=20):
+    results = {}
+    for path in PAYLOAD_ENDPOINTS:
+        response = await client.get(path, headers={"Accept-Encoding": "identity"})
+        response.raise_for_status()
+        results[path] = encode_payload(app_main, response.json(), runs)
+    return results
+
+def print_encoding(results):
+    for path, result in results.items():
+        compressed = "  ".join(
+            f"{encoding} {result[f'{encoding}_bytes']:>8} B in {result[f'{encoding}_ms']:6.2f}ms"
+            for encoding in ("gzip", "br") if f"{encoding}_bytes" in result
+        )
+        print(f"{path:<46} {result['bytes']:>9} B  encode {result['encode_ms']:6.2f}ms "
+              f"(default {result['default_encode_ms']:6.2f}ms)  {compressed}")
+
+async def run(args):
+    import httpx
+    import main as app_main
+
+    seed_ledger(app_main, args.days, args.rows_per_day, args.customers)
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.lifespan(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            return await measure_encoding(app_main, client, args.runs)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure payload size and encoding time of large responses')
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rows-per-day', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=20, help='timed encodings per payload')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='credit-bench-'))
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('CREDIT_LOG_LEVEL', 'OFF')
+
+    print_encoding(asyncio.run(run(args)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Report endpoint latency on a synthetic ledger
+#
+# Usage (from backend/):  python benchmarks/bench_reports.py [--days 365] [--rows-per-day 200] [--requests 200]
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from synthetic import BACKEND_DIR, seed_ledger
+
+ENDPOINTS = [
+    '/api/reports/latest',
+    '/api/reports/daily',
+    '/api/reports/summary',
+    '/api/reports/charts',
+    '/api/reports/daily/{day}',
+    '/api/reports/daily/{day}/charts',
+    '/api/credits',
+    '/api/reports/aging',
+    '/api/dashboard',
+]
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run(args):
+    import httpx
+    import main as app_main
+
+    start = time.perf_counter()
+    day = seed_ledger(app_main, args.days, args.rows_per_day, args.customers)
+    print(f"seeded {args.days * args.rows_per_day} rows in {time.perf_counter() - start:.1f}s")
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for template in ENDPOINTS:
+            path = template.format(day=day)
+            await client.get(path)
+            samples = []
+            for _ in range(args.requests):
+                begin = time.perf_counter()
+                response = await client.get(path)
+                samples.append((time.perf_counter() - begin) * 1000)
+                response.raise_for_status()
+            print(f"{template:<32} p50={statistics.median(samples):7.2f}ms  p95={percentile(samples, 95):7.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure report endpoint latency')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rows-per-day', type=int, default=200)
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='credit-bench-'))
+    sys.path.insert(0, BACKEND_DIR)
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
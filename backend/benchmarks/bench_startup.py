@@ -0,0 +1,79 @@
+# Cold start benchmark: launches a fresh interpreter per run and times importing
+# the app, running its startup, and serving the first request
+#
+# Usage (from backend/):  python benchmarks/bench_startup.py [--runs 10] [--path /api/reports/latest]
+# Each run reuses the same database, like a worker restarting; one untimed run
+# creates it first.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import BACKEND_DIR
+
+# Runs in the child interpreter; prints its timings as JSON
+CHILD = '''
+import asyncio, json, sys, time
+import httpx
+started = time.perf_counter()
+sys.path.insert(0, {backend_dir!r})
+
+import main as app_main
+imported = time.perf_counter()
+
+async def first_request():
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.lifespan(app_main.app):
+        ready = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            response = await client.get({path!r})
+            response.raise_for_status()
+        return ready, time.perf_counter()
+
+ready, served = asyncio.run(first_request())
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+    "pandas_loaded": "pandas" in sys.modules
+}}))
+'''
+
+def run_once(workdir, path):
+    code = CHILD.format(backend_dir=BACKEND_DIR, path=path)
+    env = dict(os.environ, CREDIT_LOG_LEVEL=os.environ.get('CREDIT_LOG_LEVEL', 'OFF'))
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, capture_output=True, text=True)
+    total_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return dict(json.loads(result.stdout.splitlines()[-1]), total_ms=total_ms)
+
+# Median timings over several cold starts against one database in workdir
+def measure_startup(workdir, runs=10, path='/api/reports/latest'):
+    run_once(workdir, path)
+    samples = [run_once(workdir, path) for _ in range(runs)]
+    result = {
+        key: round(statistics.median(sample[key] for sample in samples), 1)
+        for key in ('import_ms', 'startup_ms', 'first_request_ms', 'total_ms')
+    }
+    result['pandas_loaded'] = any(sample['pandas_loaded'] for sample in samples)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start to the first served request')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/api/reports/latest', help='endpoint for the first request')
+    args = parser.parse_args()
+
+    result = measure_startup(tempfile.mkdtemp(prefix='credit-bench-'), args.runs, args.path)
+    print(f"import {result['import_ms']:.1f}ms  startup {result['startup_ms']:.1f}ms  "
+          f"first request {result['first_request_ms']:.1f}ms  total {result['total_ms']:.1f}ms  "
+          f"(median of {args.runs}, pandas loaded: {result['pandas_loaded']})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+# Whole-API benchmark: seeds a synthetic ledger, calls every /api/* endpoint in
+# process through the ASGI app, and records latency, throughput, peak memory and
+# payload size as JSON so runs can be compared across commits
+#
+# Usage (from backend/):
+#   python benchmarks/bench_suite.py [--customers 2000] [--days 365] [--rows-per-day 200] [--output baseline.json]
+#   python benchmarks/bench_suite.py --compare baseline.json [--max-regression 25]
+# With --compare, exits non-zero when an endpoint's p95 is more than
+# --max-regression percent above the baseline's.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from bench_encoding import measure_encoding, print_encoding
+from bench_reports import percentile
+from bench_startup import measure_startup
+from synthetic import BACKEND_DIR, ledger_days, seed_ledger, write_day_sheet
+
+# Read endpoints, formatted with a day, customer and search term from the seeded ledger
+GET_ENDPOINTS = [
+    '/api/transactions?limit=100',
+    '/api/transactions?limit=1000',
+    '/api/transactions?limit=1000&format=columnar',
+    '/api/transactions/date/{day}',
+    '/api/transactions/customer/{customer}',
+    '/api/export/transactions?format=ndjson',
+    '/api/export/transactions?format=csv',
+    '/api/customers/search?q={search}',
+    '/api/credits',
+    '/api/credits/{customer}',
+    '/api/credits/{customer}/timeline',
+    '/api/reports/daily/{day}',
+    '/api/reports/daily/{day}/charts',
+    '/api/reports/daily',
+    '/api/reports/daily?format=columnar',
+    '/api/reports/latest',
+    '/api/reports/summary',
+    '/api/reports/charts',
+    '/api/reports/charts?bucket=month',
+    '/api/reports/aging',
+    '/api/dashboard',
+]
+
+# Every endpoint gets at least this many timed requests, however slow it is
+MIN_SAMPLES = 5
+
+def summarize(samples, elapsed, peak_bytes):
+    return {
+        "requests": len(samples),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "peak_kib": round(peak_bytes / 1024) if peak_bytes is not None else None
+    }
+
+# Peak Python allocation while one call runs, across all threads
+async def traced_peak(call):
+    tracemalloc.start()
+    try:
+        await call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# Time sequential requests to one endpoint until --requests or --max-seconds is reached.
+# Sizes are of the decoded body and of what crossed the wire after compression.
+async def measure(client, args, method, path, **kwargs):
+    async def call():
+        response = await client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response
+
+    response = await call()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < args.requests and (len(samples) < MIN_SAMPLES or time.perf_counter() - started < args.max_seconds):
+        begin = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - started
+
+    return dict(
+        summarize(samples, elapsed, await traced_peak(call)),
+        bytes=len(response.content),
+        wire_bytes=response.num_bytes_downloaded,
+        content_encoding=response.headers.get('content-encoding')
+    )
+
+# Sheets for the days after the seeded ledger, so every upload stores new rows
+def write_upload_sheets(workdir, args, count):
+    start = date(2024, 1, 1) + timedelta(days=args.days)
+    sheets = []
+    for day, frame in ledger_days(args.customers, count, args.rows_per_day, start=start, seed=1):
+        path = os.path.join(workdir, f"{day}.xlsx")
+        write_day_sheet(path, day, frame)
+        with open(path, 'rb') as f:
+            sheets.append((f"{day}.xlsx", f.read()))
+    return sheets
+
+async def measure_uploads(app_main, client, args, sheets):
+    results = {}
+    rows = args.rows_per_day
+
+    # Start every parse worker first so process start-up is not timed
+    loop = asyncio.get_running_loop()
+    name, contents = sheets[0]
+    await asyncio.gather(*[
+        loop.run_in_executor(app_main.parse_executor, app_main.read_sheet, contents, name)
+        for _ in range(app_main.PARSE_WORKERS)
+    ])
+
+    # One request per new sheet; the last sheet is uploaded under tracemalloc
+    single = sheets[:args.upload_files]
+    samples = []
+    started = time.perf_counter()
+    for name, contents in single:
+        begin = time.perf_counter()
+        response = await client.post('/api/upload', files={'file': (name, contents)})
+        response.raise_for_status()
+        samples.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - started
+
+    name, contents = sheets[args.upload_files]
+    peak = await traced_peak(lambda: client.post('/api/upload', files={'file': (name, contents)}))
+    results['POST /api/upload'] = dict(summarize(samples, elapsed, peak), rows_per_second=round(rows * len(single) / elapsed))
+
+    # Several sheets in one batch request
+    batch = sheets[args.upload_files + 1:args.upload_files + 1 + args.batch_files]
+    started = time.perf_counter()
+    response = await client.post('/api/upload/batch', files=[('files', sheet) for sheet in batch])
+    response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    results['POST /api/upload/batch'] = dict(
+        summarize([elapsed * 1000], elapsed, None),
+        rows_per_second=round(rows * len(batch) / elapsed)
+    )
+
+    # A background job, timed from the request until the job reports done
+    name, contents = sheets[-1]
+    started = time.perf_counter()
+    response = await client.post('/api/upload?background=true', files={'file': (name, contents)})
+    response.raise_for_status()
+    job_id = response.json()['job_id']
+    while True:
+        job = (await client.get(f'/api/upload/{job_id}')).json()
+        if job['status'] in ('done', 'failed'):
+            break
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    if job['status'] != 'done':
+        raise RuntimeError(f"background upload failed: {job['error']}")
+    results['POST /api/upload?background=true'] = dict(
+        summarize([elapsed * 1000], elapsed, None),
+        rows_per_second=round(rows / elapsed)
+    )
+    results['GET /api/upload/{job_id}'] = await measure(client, args, 'GET', f'/api/upload/{job_id}')
+
+    return results
+
+async def run(args, workdir):
+    import httpx
+    import main as app_main
+
+    started = time.perf_counter()
+    day = seed_ledger(app_main, args.days, args.rows_per_day, args.customers)
+    seed_seconds = time.perf_counter() - started
+    seeded_rows = args.days * args.rows_per_day
+    print(f"seeded {seeded_rows} rows in {seed_seconds:.1f}s")
+
+    sheets = write_upload_sheets(workdir, args, args.upload_files + 1 + args.batch_files + 1)
+    values = {"day": day, "customer": "Customer 1", "search": "customer 1"}
+
+    endpoints = {}
+    headers = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else {}
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.lifespan(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None, headers=headers) as client:
+            for template in GET_ENDPOINTS:
+                endpoints[f"GET {template}"] = await measure(client, args, 'GET', template.format(**values))
+                print_result(f"GET {template}", endpoints[f"GET {template}"])
+
+            encoding = await measure_encoding(app_main, client)
+            print_encoding(encoding)
+
+            for name, result in (await measure_uploads(app_main, client, args, sheets)).items():
+                endpoints[name] = result
+                print_result(name, result)
+
+    # Parse workers only count towards RUSAGE_CHILDREN once they have exited
+    app_main.parse_executor.shutdown()
+    startup = measure_startup(tempfile.mkdtemp(prefix='credit-bench-'), args.startup_runs)
+    print(f"startup: import {startup['import_ms']:.1f}ms, first request served after {startup['total_ms']:.1f}ms")
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {
+                "customers": args.customers,
+                "days": args.days,
+                "rows_per_day": args.rows_per_day,
+                "requests": args.requests,
+                "response_cache": args.cache,
+                "accept_encoding": args.accept_encoding
+            }
+        },
+        "seed": {
+            "rows": seeded_rows,
+            "seconds": round(seed_seconds, 3),
+            "rows_per_second": round(seeded_rows / seed_seconds)
+        },
+        "startup": startup,
+        "encoding": encoding,
+        "max_rss_kib": usage.ru_maxrss,
+        "max_child_rss_kib": children.ru_maxrss,
+        "endpoints": endpoints
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_result(name, result):
+    peak = f"{result['peak_kib']:>8} KiB" if result['peak_kib'] is not None else f"{'-':>8}    "
+    size = f"  {result['wire_bytes']:>9} B" if 'wire_bytes' in result else ""
+    print(f"{name:<48} p50={result['p50_ms']:9.2f}ms  p95={result['p95_ms']:9.2f}ms  "
+          f"{result['throughput_rps']:8.1f} req/s  peak={peak}{size}")
+
+# Print p95 changes against a baseline run; returns the endpoints that regressed
+def compare(results, baseline, max_regression):
+    if baseline['meta']['params'] != results['meta']['params']:
+        print(f"warning: baseline params {baseline['meta']['params']} differ from this run's")
+
+    print(f"\ncompared with {baseline['meta'].get('commit') or 'baseline'} (p95):")
+    regressions = []
+    if 'startup' in baseline:
+        previous, current = baseline['startup']['total_ms'], results['startup']['total_ms']
+        change = (current - previous) / previous * 100
+        flag = '  REGRESSION' if change > max_regression else ''
+        print(f"{'cold start to first request':<48} {previous:9.2f}ms -> {current:9.2f}ms  {change:+7.1f}%{flag}")
+        if flag:
+            regressions.append('startup')
+    for name, current in results['endpoints'].items():
+        previous = baseline['endpoints'].get(name)
+        if not previous:
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100
+        flag = '  REGRESSION' if change > max_regression else ''
+        print(f"{name:<48} {previous['p95_ms']:9.2f}ms -> {current['p95_ms']:9.2f}ms  {change:+7.1f}%{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API endpoint on a synthetic ledger')
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rows-per-day', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=100, help='timed requests per endpoint')
+    parser.add_argument('--max-seconds', type=float, default=5.0, help='time budget per endpoint')
+    parser.add_argument('--upload-files', type=int, default=10)
+    parser.add_argument('--batch-files', type=int, default=5)
+    parser.add_argument('--startup-runs', type=int, default=5, help='cold starts timed for the startup figure')
+    parser.add_argument('--accept-encoding', help="Accept-Encoding sent with reads, e.g. identity (defaults to the client's own)")
+    parser.add_argument('--cache', action='store_true', help='keep the response cache on (it is off by default so handlers are measured)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--max-regression', type=float, default=25.0, help='allowed p95 increase over the baseline, in percent')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    output = os.path.abspath(args.output) if args.output else None
+
+    workdir = tempfile.mkdtemp(prefix='credit-bench-')
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    if not args.cache:
+        os.environ['CREDIT_RESPONSE_CACHE_ENTRIES'] = '0'
+
+    results = asyncio.run(run(args, workdir))
+    print(f"max rss {results['max_rss_kib']} KiB, parse workers {results['max_child_rss_kib']} KiB")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {output}")
+
+    if baseline and compare(results, baseline, args.max_regression):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Ingest benchmark: full-frame vs streaming sheet readers, and the legacy per-row
+# iterrows + execute insert vs the vectorized executemany path
+#
+# Usage (from backend/):  python benchmarks/bench_upload.py [--rows 100000]
+import argparse
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from synthetic import BACKEND_DIR, write_workbook
+
+# The original upload loop, kept here only as the baseline
+def legacy_ingest(conn, df, date_iso):
+    cursor = conn.cursor()
+    rows_processed = 0
+    for _, row in df.iterrows():
+        sales = float(row['sales']) if row['sales'] else 0
+        cash = float(row['cash']) if row['cash'] else 0
+        hdfc = float(row['hdfc']) if row['hdfc'] else 0
+        gpay = float(row['gpay']) if row['gpay'] else 0
+        payment = float(row['payment']) if row['payment'] else 0
+
+        received = cash + hdfc + gpay
+        outstanding = 0
+        if sales > 0:
+            transaction_type = 'sale'
+            outstanding = sales - received
+        elif received > 0 and sales == 0:
+            transaction_type = 'repayment'
+        elif payment > 0:
+            transaction_type = 'expense'
+        else:
+            continue
+
+        cursor.execute('''
+        INSERT INTO transactions
+        (date, customer_name, sales, cash, hdfc, gpay, payment, transaction_type, outstanding)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (date_iso, row['customer_name'], sales, cash, hdfc, gpay, payment, transaction_type, outstanding))
+        rows_processed += 1
+    conn.commit()
+    return rows_processed
+
+def vectorized_ingest(main, conn, df, date_iso):
+    transactions = main.prepare_transactions(df, date_iso)
+    with conn:
+        return main.insert_transactions(conn, main.with_customer_ids(conn, transactions))
+
+def clean_frame(pd, path):
+    df = pd.read_excel(path).rename(columns={
+        'Particulars': 'customer_name',
+        'SALES': 'sales',
+        'CASH': 'cash',
+        'kotak/hdfc': 'hdfc',
+        'G PAY': 'gpay',
+        'PAYMENT': 'payment'
+    })
+    df = df[['customer_name', 'sales', 'cash', 'hdfc', 'gpay', 'payment']].fillna(0)
+    return df
+
+def timed(label, rows, fn):
+    start = time.perf_counter()
+    inserted = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {inserted:>8} rows  {elapsed:8.3f}s  {inserted / elapsed:>12,.0f} rows/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the /api/upload ingest stage')
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='credit-bench-')
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    import pandas as pd
+    import main as app_main
+    app_main.init_db()
+
+    path = os.path.join(workdir, 'sheet.xlsx')
+    start = time.perf_counter()
+    write_workbook(path, args.rows)
+    print(f"generated {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    # Sheet readers: the full-frame pandas path against the streaming .xlsx and CSV paths
+    with open(path, 'rb') as f:
+        contents = f.read()
+    csv_contents = pd.read_excel(io.BytesIO(contents)).to_csv(index=False).encode()
+
+    full = timed('read pandas', args.rows, lambda: len(app_main.clean_sheet(pd.read_excel(io.BytesIO(contents)))[0]))
+    stream = timed('read stream', args.rows, lambda: len(app_main.read_sheet(contents, 'sheet.xlsx')[0]))
+    csv = timed('read csv', args.rows, lambda: len(app_main.read_sheet(csv_contents, 'sheet.csv')[0]))
+    print(f"speedup      stream {full / stream:.1f}x, csv {full / csv:.1f}x")
+
+    df = clean_frame(pd, path)
+
+    def fresh_db(name):
+        conn = sqlite3.connect(os.path.join(workdir, name))
+        conn.executescript(open_schema(app_main))
+        return conn
+
+    legacy = timed('legacy', args.rows, lambda: legacy_ingest(fresh_db('legacy.db'), df, '2024-04-01'))
+    vector = timed('vectorized', args.rows, lambda: vectorized_ingest(app_main, fresh_db('vector.db'), df, '2024-04-01'))
+    print(f"speedup      {legacy / vector:.1f}x")
+
+# Copy the live schema out of the app's database so both runs use identical tables
+def open_schema(app_main):
+    conn = app_main.get_db_connection()
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    conn.close()
+    # Shadow tables are created by their virtual table, not copied
+    virtual = [row[0] + '_' for row in rows if row[1].startswith('CREATE VIRTUAL TABLE')]
+    statements = [row[1] for row in rows if not row[0].startswith(tuple(virtual))]
+    return ";\n".join(statements) + ";"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+# Query plan regression check: seeds a large synthetic ledger, calls every
+# endpoint (reads, uploads, a month close and the aging rollover) while recording the SQL they
+# run, then EXPLAINs each statement and fails if any plan scans a whole table or
+# sorts through a temporary B-tree
+#
+# Usage (from backend/):  python benchmarks/check_query_plans.py [--days 365] [--rows-per-day 200] [--verbose]
+# Exits non-zero when a statement has a bad plan and is not listed in ALLOWED.
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from synthetic import BACKEND_DIR, ledger_days, seed_ledger, write_day_sheet
+
+# Requests made against the seeded ledger, formatted with a day in it, a date
+# range, a customer and a job id
+GET_ENDPOINTS = [
+    '/api/transactions?limit=100',
+    '/api/transactions?limit=100&cursor={day}:1000000000',
+    '/api/transactions?from_date={from_date}&to_date={to_date}&limit=100',
+    '/api/transactions?from_date={from_date}&limit=100',
+    '/api/transactions?customer_name={customer}&limit=100',
+    '/api/transactions?customer_name={customer}&from_date={from_date}&to_date={to_date}',
+    '/api/transactions?transaction_type=sale&limit=100',
+    '/api/transactions?transaction_type=expense&from_date={from_date}&to_date={to_date}&limit=100',
+    '/api/transactions?fields=date,customer_name,sales&limit=100',
+    '/api/transactions/date/{day}',
+    '/api/transactions/date/{day}?limit=50&cursor={day}:1000000000',
+    '/api/transactions/customer/{customer}',
+    '/api/transactions/customer/{customer}?limit=20',
+    '/api/transactions?include_archived=true&limit=100',
+    '/api/transactions?include_archived=true&limit=100&cursor={closed_day}:1000000000',
+    '/api/transactions?include_archived=true&customer_name={customer}&limit=100',
+    '/api/transactions/date/{closed_day}?include_archived=true',
+    '/api/transactions/customer/{customer}?include_archived=true',
+    '/api/export/transactions?include_archived=true&from_date={closed_from}&to_date={closed_day}',
+    '/api/export/transactions?format=csv',
+    '/api/export/transactions?from_date={from_date}&to_date={to_date}',
+    '/api/export/transactions?customer_name={customer}',
+    '/api/customers/search?q=cu',
+    '/api/customers/search?q=omer 1',
+    '/api/credits',
+    '/api/credits/{customer}',
+    '/api/credits/{customer}/timeline',
+    '/api/reports/daily/{day}',
+    '/api/reports/daily/{day}/charts',
+    '/api/reports/daily/{closed_day}/charts',
+    '/api/reports/daily',
+    '/api/reports/daily?from_date={from_date}&to_date={to_date}',
+    '/api/reports/latest',
+    '/api/reports/summary',
+    '/api/reports/summary?from_date={from_date}&to_date={to_date}',
+    '/api/reports/charts',
+    '/api/reports/charts?from_date={from_date}&to_date={to_date}&bucket=week',
+    '/api/reports/charts?bucket=month',
+    '/api/reports/aging',
+    '/api/reports/aging?customer_name={customer}',
+    '/api/dashboard',
+    '/api/dashboard?from_date={from_date}&to_date={to_date}&bucket=week',
+    '/api/upload/{job_id}',
+    '/api/periods',
+]
+
+# Statements whose whole-table read or sort is the point of the query,
+# as (pattern searched for in the SQL, reason)
+ALLOWED = [
+    (r"^INSERT INTO customer_aging .* GROUP BY 1, 2$",
+     "the bucket depends on the as-of date; only the refreshed customers' open sales are grouped"),
+    (r"FROM customers_fts .* ORDER BY customers.normalized_name",
+     "trigram matches come back in rowid order and are sorted by name"),
+    (r"^SELECT .* FROM daily_rollups$",
+     "all-time totals sum the rollup table, one row per day"),
+    (r"^SELECT .* as bucket, .* FROM daily_rollups WHERE .* GROUP BY bucket",
+     "week and month buckets are computed from the date; at most one rollup row per day is grouped"),
+    (r"FROM customer_aging .* ORDER BY total DESC",
+     "customers are ranked by their aggregated total, one row per customer"),
+    (r"^INSERT INTO customer_month_summaries .* GROUP BY customer_id, substr\(date, 1, 7\)",
+     "a month close folds every row before the cutoff into per-customer months, once"),
+    (r"^INSERT INTO customer_balances .* FROM customer_month_summaries .* GROUP BY customer_id$",
+     "live rows and closed-month summaries are unioned, then grouped per refreshed customer"),
+    (r"^SELECT transaction_type, COUNT\(\*\) as count FROM all_transactions WHERE date = ",
+     "a closed day's rows are split between the live and archive tables; one day's rows are grouped"),
+]
+
+# Plan details that mean the statement reads more than it needs
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?!.*\bINDEX\b)")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+# Literals replaced so the same statement with other parameters is checked once
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+class StatementLog:
+    def __init__(self):
+        self.source = None
+        self.statements = {}
+
+    def trace(self, sql):
+        if self.source is None or sql.startswith('--'):
+            return
+        sql = " ".join(sql.split())
+        if not re.match(r"(?i)(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", sql):
+            return
+        self.statements.setdefault(LITERALS.sub('?', sql), (self.source, sql))
+
+# Record every statement run on the app's connections, tagged with the request
+# that ran it; expanded SQL has its parameters inlined, so it can be EXPLAINed
+def record_statements(app_main, log):
+    open_db_connection = app_main.open_db_connection
+
+    def traced(*args, **kwargs):
+        conn = open_db_connection(*args, **kwargs)
+        conn.set_trace_callback(log.trace)
+        return conn
+
+    app_main.open_db_connection = traced
+
+async def exercise(app_main, args, log, workdir, values):
+    import httpx
+
+    # Sheets for a new day, the same day with rows changed, and a batch after it
+    start = date(2024, 1, 1) + timedelta(days=args.days)
+    sheets = []
+    for day, frame in ledger_days(args.customers, 4, args.rows_per_day, start=start, seed=1):
+        path = os.path.join(workdir, f"{day}.xlsx")
+        write_day_sheet(path, day, frame)
+        with open(path, 'rb') as f:
+            sheets.append((f"{day}.xlsx", f.read()))
+    day, frame = next(ledger_days(args.customers, 1, args.rows_per_day, start=start, seed=2))
+    changed = os.path.join(workdir, 'changed.xlsx')
+    write_day_sheet(changed, day, frame)
+    with open(changed, 'rb') as f:
+        sheets.insert(1, ('changed.xlsx', f.read()))
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.lifespan(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://check', timeout=None) as client:
+            log.source = 'POST /api/upload'
+            (await client.post('/api/upload', files={'file': sheets[0]})).raise_for_status()
+            log.source = 'POST /api/upload (re-upload)'
+            (await client.post('/api/upload', files={'file': sheets[1]})).raise_for_status()
+            log.source = 'POST /api/upload/batch'
+            (await client.post('/api/upload/batch', files=[('files', sheet) for sheet in sheets[2:4]])).raise_for_status()
+
+            log.source = 'POST /api/upload?background=true'
+            response = await client.post('/api/upload?background=true', files={'file': sheets[4]})
+            response.raise_for_status()
+            values['job_id'] = response.json()['job_id']
+            while (await client.get(f"/api/upload/{values['job_id']}")).json()['status'] not in ('done', 'failed'):
+                await asyncio.sleep(0.01)
+
+            log.source = 'POST /api/periods/{month}/close'
+            (await client.post(f"/api/periods/{values['closed_day'][:7]}/close")).raise_for_status()
+
+            for template in GET_ENDPOINTS:
+                log.source = f"GET {template}"
+                (await client.get(template.format(**values))).raise_for_status()
+
+    # The daily rollover a month on, so sales cross bucket boundaries, then after
+    # a gap long enough that aging is rebuilt for everyone
+    conn = app_main.get_db_connection()
+    today = date.fromisoformat(app_main.aging_today())
+    for source, days in (('aging rollover', 31), ('aging rebuild', 200)):
+        log.source = source
+        with conn:
+            app_main.roll_aging_forward(conn, today=(today + timedelta(days=days)).isoformat())
+    log.source = None
+
+def bad_plan_rows(conn, sql, tables):
+    plan = [row['detail'] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    bad = [
+        detail for detail in plan
+        if TEMP_SORT.search(detail) or ((match := FULL_SCAN.match(detail)) and match.group(1) in tables)
+    ]
+    return plan, bad
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail on endpoint queries that scan whole tables or sort in temp B-trees')
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rows-per-day', type=int, default=200)
+    parser.add_argument('--verbose', action='store_true', help='print every statement with its plan')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='credit-plans-')
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('CREDIT_LOG_LEVEL', 'OFF')
+    os.environ['CREDIT_RESPONSE_CACHE_ENTRIES'] = '0'
+    import main as app_main
+
+    log = StatementLog()
+    record_statements(app_main, log)
+    day = seed_ledger(app_main, args.days, args.rows_per_day, args.customers)
+    print(f"seeded {args.days * args.rows_per_day} rows")
+
+    values = {
+        "day": day,
+        "from_date": (date.fromisoformat(day) - timedelta(days=30)).isoformat(),
+        "to_date": day,
+        "customer": "Customer 1",
+        "closed_from": "2024-03-01",
+        "closed_day": "2024-03-31"
+    }
+    asyncio.run(exercise(app_main, args, log, workdir, values))
+
+    conn = app_main.open_db_connection()
+    tables = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    failures = 0
+    for source, sql in log.statements.values():
+        plan, bad = bad_plan_rows(conn, sql, tables)
+        allowed = next((reason for pattern, reason in ALLOWED if re.search(pattern, sql)), None)
+        if bad and not allowed:
+            failures += 1
+        if args.verbose or (bad and not allowed):
+            status = 'FAIL' if bad and not allowed else 'ok  '
+            print(f"\n{status} {source}{f' (allowed: {allowed})' if bad and allowed else ''}\n  {sql[:300]}")
+            for detail in plan:
+                print(f"    {'!' if detail in bad else ' '} {detail}")
+    conn.close()
+
+    print(f"\nchecked {len(log.statements)} statements, {failures} with bad plans")
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Synthetic ledgers for the benchmarks: customers x days x rows per day, either
+# stored straight into the app's database or written out as daily Excel sheets
+#
+# Usage (from backend/):  python benchmarks/synthetic.py OUT_DIR [--customers 2000] [--days 365] [--rows-per-day 200]
+# Writes one YYYY-MM-DD.xlsx per day, in the layout staff upload.
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SHEET_HEADER = ['Particulars', 'SALES', 'CASH', 'kotak/hdfc', 'G PAY', 'PAYMENT']
+
+# Write a synthetic daily sheet in the same layout staff upload
+def write_workbook(path, rows, seed=0, customers=2000, day='01-04-24'):
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(SHEET_HEADER + [f'DATE {day}'])
+    for i in range(rows):
+        customer = f"Customer {rng.randrange(customers)}"
+        kind = rng.random()
+        if kind < 0.6:
+            sales = rng.randrange(100, 5000)
+            paid = rng.randrange(0, sales)
+            ws.append([customer, sales, paid, 0, 0, 0, None])
+        elif kind < 0.9:
+            ws.append([customer, 0, 0, rng.randrange(50, 2000), rng.randrange(0, 500), 0, None])
+        else:
+            ws.append([f"Expense {i}", 0, 0, 0, 0, rng.randrange(10, 1000), None])
+    wb.save(path)
+
+# Build one day's sheet as a cleaned frame, skipping the Excel round-trip
+def synthetic_day(pd, rng, customers, rows):
+    kind = rng.random(rows)
+    sales = rng.integers(100, 5000, rows).astype(float)
+    paid = (sales * rng.random(rows)).round()
+    repaid = rng.integers(50, 2000, rows).astype(float)
+    expense = rng.integers(10, 1000, rows).astype(float)
+    is_sale = kind < 0.6
+    is_repayment = (kind >= 0.6) & (kind < 0.9)
+    is_expense = kind >= 0.9
+    return pd.DataFrame({
+        'customer_name': [f"Customer {n}" for n in rng.integers(0, customers, rows)],
+        'sales': sales * is_sale,
+        'cash': paid * is_sale,
+        'hdfc': repaid * is_repayment,
+        'gpay': 0.0,
+        'payment': expense * is_expense,
+    })
+
+# Yield (YYYY-MM-DD, frame) for consecutive days; the same seed gives the same ledger
+def ledger_days(customers, days, rows_per_day, start=date(2024, 1, 1), seed=0):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        yield day, synthetic_day(pd, rng, customers, rows_per_day)
+
+# Store a synthetic ledger through the app's own write path; returns the middle day
+def seed_ledger(app_main, days, rows_per_day, customers, start=date(2024, 1, 1), seed=0):
+    app_main.init_db()
+    for day, frame in ledger_days(customers, days, rows_per_day, start, seed):
+        app_main.store_sheet(app_main.prepare_transactions(frame, day), day, f"synthetic-{day}", f"{day}.xlsx")
+    return (start + timedelta(days=days // 2)).isoformat()
+
+# Write one day's frame as an uploadable sheet
+def write_day_sheet(path, day, frame):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(SHEET_HEADER + [f"DATE {date.fromisoformat(day):%d-%m-%y}"])
+    for row in frame.itertuples(index=False):
+        ws.append([row.customer_name, row.sales, row.cash, row.hdfc, row.gpay, row.payment])
+    wb.save(path)
+
+# Write a synthetic ledger as daily sheets; returns the paths in date order
+def write_ledger_sheets(out_dir, customers, days, rows_per_day, start=date(2024, 1, 1), seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for day, frame in ledger_days(customers, days, rows_per_day, start, seed):
+        path = os.path.join(out_dir, f"{day}.xlsx")
+        write_day_sheet(path, day, frame)
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic ledger as daily Excel sheets')
+    parser.add_argument('out_dir')
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rows-per-day', type=int, default=200)
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2024, 1, 1))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_ledger_sheets(args.out_dir, args.customers, args.days, args.rows_per_day, args.start, args.seed)
+    print(f"wrote {len(paths)} sheets of {args.rows_per_day} rows to {args.out_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,398 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
-import pandas as pd
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
 import sqlite3
+import asyncio
+import bisect
+import contextvars
+import functools
+import hashlib
+import logging
+import multiprocessing
+import csv
+import io
+import json
 import os
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from email.utils import formatdate
+from starlette.routing import Match
+
+# Optional encoders: orjson serializes responses several times faster than the
+# standard library, and brotli adds "br" to the encodings offered to clients
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+# pandas, numpy and openpyxl are imported inside the upload functions that use
+# them; only uploads need them and they dominate the app's import time
+
+# Database location and connection tuning, overridable from the environment
+DB_PATH = os.environ.get("CREDIT_DB_PATH", "data/transactions.db")
+DB_JOURNAL_MODE = os.environ.get("CREDIT_DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.environ.get("CREDIT_DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_KIB = int(os.environ.get("CREDIT_DB_CACHE_KIB", "65536"))
+DB_MMAP_BYTES = int(os.environ.get("CREDIT_DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+DB_TEMP_STORE = os.environ.get("CREDIT_DB_TEMP_STORE", "MEMORY")
+# Seconds a writer waits for another's write transaction before giving up
+DB_BUSY_TIMEOUT = float(os.environ.get("CREDIT_DB_BUSY_TIMEOUT", "30"))
+
+# Each store (outlet) has its own database file, so one shop's uploads never
+# hold a lock another shop's reads wait on. The default store keeps DB_PATH;
+# the others listed in CREDIT_STORES live in CREDIT_STORES_DIR.
+DEFAULT_STORE = os.environ.get("CREDIT_DEFAULT_STORE", "main")
+STORES_DIR = os.environ.get("CREDIT_STORES_DIR", "data/stores")
+STORES = list(dict.fromkeys(
+    [DEFAULT_STORE] + [name.strip() for name in os.environ.get("CREDIT_STORES", "").split(",") if name.strip()]
+))
+
+# Store the current request or job works on
+current_store = contextvars.ContextVar("current_store", default=DEFAULT_STORE)
+
+def store_db_path(store):
+    return DB_PATH if store == DEFAULT_STORE else os.path.join(STORES_DIR, f"{store}.db")
+
+# Call func with another store selected, leaving the caller's store unchanged
+def run_in_store(store, func, *args, **kwargs):
+    def call():
+        current_store.set(store)
+        return func(*args, **kwargs)
+    return contextvars.copy_context().run(call)
+
+# Structured logs: one JSON object per line on stderr. CREDIT_LOG_LEVEL takes a
+# standard level name, or OFF to silence the app's logs entirely.
+LOG_LEVEL = os.environ.get("CREDIT_LOG_LEVEL", "INFO").upper()
+SLOW_QUERY_MS = float(os.environ.get("CREDIT_SLOW_QUERY_MS", "100"))
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "event": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["error"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+logger = logging.getLogger("credit")
+logger.propagate = False
+if LOG_LEVEL == "OFF":
+    logger.disabled = True
+else:
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(JsonLogFormatter())
+    logger.addHandler(log_handler)
+    logger.setLevel(LOG_LEVEL)
+
+# Log an event with structured fields
+def log_event(level, event, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+# In-process Prometheus metrics. Observations come from the event loop and the
+# database threads, so each metric guards its series with a lock.
+class Histogram:
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = format_labels(self.label_names, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float("inf")], values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{{{labels}{',' if labels else ''}le=\"{le}\"}} {cumulative}")
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+class MetricCounter:
+    def __init__(self, name, documentation, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.series = Counter()
+        self.lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self.lock:
+            self.series[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = dict(self.series)
+        for label_values, value in sorted(series.items()):
+            lines.append(f"{self.name}{{{format_labels(self.label_names, label_values)}}} {value}")
+        return lines
+
+def format_labels(label_names, label_values):
+    escaped = [str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in label_values]
+    return ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped))
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Time to the response start, per route.",
+    ("method", "route", "status"), LATENCY_BUCKETS
+)
+query_latency = Histogram(
+    "sqlite_query_duration_seconds", "Time spent executing and fetching each SQL statement, by kind and table.",
+    ("statement",), LATENCY_BUCKETS
+)
+slow_queries = MetricCounter(
+    "sqlite_slow_queries_total", f"Statements slower than CREDIT_SLOW_QUERY_MS ({SLOW_QUERY_MS:g} ms).",
+    ("statement",)
+)
+response_cache_lookups = MetricCounter(
+    "response_cache_lookups_total", "Report reads by response cache outcome.",
+    ("result",)
+)
 
-# Create the database directory if it doesn't exist
-os.makedirs("data", exist_ok=True)
+METRICS = [request_latency, query_latency, slow_queries, response_cache_lookups]
+
+# Set up every store's database once per process, then start a background upload
+# worker per store and the daily aging rollover for the lifetime of the app.
+# Importing this module has no side effects, so tools and parse workers can
+# import it cheaply.
+@asynccontextmanager
+async def lifespan(app):
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(db_executor, run_in_store, store, init_db) for store in STORES])
+    app.state.upload_queues = {store: asyncio.Queue() for store in STORES}
+    workers = [
+        asyncio.create_task(run_upload_jobs(store, queue))
+        for store, queue in app.state.upload_queues.items()
+    ]
+    rollover = asyncio.create_task(run_aging_rollover())
+    yield
+    for worker in workers:
+        worker.cancel()
+    rollover.cancel()
+
+# Serialize a response body, with orjson when it is installed
+def dump_json(content):
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+# The default response class. FastAPI passes plain return values through
+# jsonable_encoder before rendering, which costs more than the query on large
+# lists, so the largest endpoints return this response directly instead.
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dump_json(content)
+
+# Large list endpoints return rows by default or, with ?format=columnar, one
+# array per column like the chart series, so keys are not repeated per row
+RESPONSE_FORMATS = ("rows", "columnar")
+
+def check_response_format(format):
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(RESPONSE_FORMATS)}")
+
+def to_columns(rows, columns):
+    return {column: [row[index] for row in rows] for index, column in enumerate(columns)}
 
 # Initialize FastAPI app
-app = FastAPI(title="Credit Tracking System")
+app = FastAPI(title="Credit Tracking System", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# Read-only endpoints whose responses depend only on stored data (and today's date)
+CACHED_PATH_PREFIXES = ("/api/reports/", "/api/credits", "/api/customers", "/api/dashboard")
+RESPONSE_CACHE_ENTRIES = int(os.environ.get("CREDIT_RESPONSE_CACHE_ENTRIES", "256"))
+
+# Serialized responses keyed by path and query, least recently used first.
+# Only touched from the event loop, so no lock is needed.
+response_cache = OrderedDict()
+
+# Serve report reads from memory until the next upload bumps the data version.
+# Registered before CORS so CORS headers are added to cached responses as well.
+# Credit aging depends on today's date, so the date is part of the validator too.
+@app.middleware("http")
+async def cache_report_responses(request: Request, call_next):
+    if request.method != "GET" or not request.url.path.startswith(CACHED_PATH_PREFIXES):
+        return await call_next(request)
+
+    loop = asyncio.get_running_loop()
+    version, updated_at = await loop.run_in_executor(db_executor, read_data_version)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    store = current_store.get()
+    etag = f'"{store}-{version}-{today:%Y%m%d}"'
+    validator_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(max(updated_at, today).timestamp(), usegmt=True),
+        "Cache-Control": "no-cache"
+    }
+
+    # Compressed responses carry the weak form of the tag, which matches too
+    not_modified = etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+
+    # Only a response this key has already produced is validated without the
+    # route, so bad parameters and unknown names still get their 400 or 404
+    key = (store, request.url.path, tuple(sorted(request.query_params.multi_items())))
+    cached = response_cache.get(key)
+    if cached and cached[0] == etag:
+        response_cache.move_to_end(key)
+        if not_modified:
+            response_cache_lookups.inc(("not_modified",))
+            return Response(status_code=304, headers=validator_headers)
+        response_cache_lookups.inc(("hit",))
+        _, body, media_type = cached
+        return Response(content=body, media_type=media_type, headers=validator_headers)
+
+    response_cache_lookups.inc(("miss",))
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    media_type = response.headers.get("content-type")
+
+    response_cache[key] = (etag, body, media_type)
+    response_cache.move_to_end(key)
+    while len(response_cache) > RESPONSE_CACHE_ENTRIES:
+        response_cache.popitem(last=False)
+
+    if not_modified:
+        return Response(status_code=304, headers=validator_headers)
+    return Response(content=body, media_type=media_type, headers=validator_headers)
+
+# Route template a request matched, so /api/credits/{customer_name} is one series.
+# Responses served by the cache never reach the router, so match them here.
+def route_template(request):
+    route = request.scope.get("route")
+    if route is None:
+        for candidate in app.router.routes:
+            if candidate.matches(request.scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+# Record request latency per route; registered after the cache so cache hits are counted
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        request_latency.observe((request.method, route_template(request), str(status)), time.perf_counter() - start)
+
+# /stores/{store}/api/... is served as /api/... for that store
+STORE_PATH_PREFIX = re.compile(r"^/stores/([^/]+)(/.*)$")
+
+# Select the store a request works on, from its path prefix or the X-Store
+# header, before the cache and the routes see it. Registered after the other
+# middlewares so it runs first.
+@app.middleware("http")
+async def select_store(request: Request, call_next):
+    store = request.headers.get("x-store", DEFAULT_STORE)
+    match = STORE_PATH_PREFIX.match(request.scope["path"])
+    if match:
+        store, request.scope["path"] = match.groups()
+    if store not in STORES:
+        return JSONResponse(status_code=404, content={"detail": f"Unknown store: {store}"})
+
+    current_store.set(store)
+    response = await call_next(request)
+    response.headers["X-Store"] = store
+    return response
+
+# Response compression: bodies of at least CREDIT_COMPRESS_MIN_BYTES are sent
+# brotli- or gzip-encoded to clients that accept it; streamed exports are
+# compressed chunk by chunk
+COMPRESS_MIN_BYTES = int(os.environ.get("CREDIT_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("CREDIT_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("CREDIT_BROTLI_QUALITY", "5"))
+
+# Best encoding the client accepts, or None to send the body as is
+def pick_encoding(accept_encoding):
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+# (compress, finish) functions of a new streaming compressor
+def open_compressor(encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress, compressor.flush
+
+# Registered after select_store so it wraps everything, cached responses included
+@app.middleware("http")
+async def compress_responses(request: Request, call_next):
+    response = await call_next(request)
+    encoding = pick_encoding(request.headers.get("accept-encoding", ""))
+    length = response.headers.get("content-length")
+    if (
+        encoding is None
+        or request.method == "HEAD"
+        or response.status_code in (204, 304)
+        or "content-encoding" in response.headers
+        or (length is not None and int(length) < COMPRESS_MIN_BYTES)
+    ):
+        return response
+
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    headers["content-encoding"] = encoding
+    headers["vary"] = f"{headers['vary']}, Accept-Encoding" if "vary" in headers else "Accept-Encoding"
+    if "etag" in headers and not headers["etag"].startswith("W/"):
+        headers["etag"] = "W/" + headers["etag"]
+    compress, finish = open_compressor(encoding)
+
+    if length is None:
+        async def compressed_chunks():
+            async for chunk in response.body_iterator:
+                data = compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+                if data:
+                    yield data
+            yield finish()
+        return StreamingResponse(compressed_chunks(), status_code=response.status_code, headers=headers)
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    return Response(content=compress(body) + finish(), status_code=response.status_code, headers=headers)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,176 +401,1668 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Store"],
 )
 
-# Database connection
-def get_db_connection():
-    conn = sqlite3.connect("data/transactions.db")
+# Blocking work runs on bounded pools so the event loop keeps serving requests:
+# a thread pool for SQLite queries and a process pool for Excel parsing, which
+# is CPU-bound pure Python and would otherwise hold the GIL against the readers
+DB_WORKERS = int(os.environ.get("CREDIT_DB_WORKERS", "8"))
+PARSE_WORKERS = int(os.environ.get("CREDIT_PARSE_WORKERS", "2"))
+
+# Work submitted to the database pool runs with the submitter's context, so
+# handlers and jobs query the store their request selected
+class StoreThreadPoolExecutor(ThreadPoolExecutor):
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+db_executor = StoreThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+# Turn a blocking route handler into a coroutine that runs on the database pool
+def run_in_db_pool(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+    return wrapper
+
+# Metric label for a statement: its verb and the first table it names
+STATEMENT_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|INDEX)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    verb = sql.split(None, 1)[0].upper() if sql.strip() else ""
+    match = STATEMENT_TABLE.search(sql)
+    return f"{verb} {match.group(1)}" if match else verb
+
+def observe_query(sql, seconds):
+    label = statement_label(sql)
+    query_latency.observe((label,), seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        slow_queries.inc((label,))
+        log_event(logging.WARNING, "slow query", statement=label, ms=round(seconds * 1000, 1), sql=" ".join(sql.split())[:500])
+
+# A cursor that times each statement from execute through its last fetch.
+# The time is recorded when the rows run out, the cursor runs another
+# statement, or it is closed or collected.
+class TimedCursor(sqlite3.Cursor):
+    statement = None
+    elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        return self.timed(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.timed(sql, super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = self.fetching(super().fetchone)
+        if row is None:
+            self.finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self.fetching(functools.partial(super().fetchmany, size))
+        if len(rows) < size:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self.fetching(super().fetchall)
+        self.finish()
+        return rows
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        if self.statement is not None:
+            self.finish()
+
+    def timed(self, sql, run, *args):
+        self.finish()
+        start = time.perf_counter()
+        try:
+            return run(*args)
+        finally:
+            self.statement = sql
+            self.elapsed = time.perf_counter() - start
+
+    def fetching(self, fetch):
+        start = time.perf_counter()
+        try:
+            return fetch()
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def finish(self):
+        if self.statement is not None:
+            sql, self.statement = self.statement, None
+            observe_query(sql, self.elapsed)
+
+# A connection whose statements and commits are all timed. Connection.execute
+# bypasses the cursor's Python methods, so it is routed through a cursor here.
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            observe_query("COMMIT", time.perf_counter() - start)
+
+# A connection that stays open when a handler closes it, so the next request
+# on the same thread reuses it instead of reconnecting
+class PooledConnection(TimedConnection):
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+# Open a new connection with the configured pragmas
+def open_db_connection(factory=TimedConnection, **kwargs):
+    kwargs.setdefault("timeout", DB_BUSY_TIMEOUT)
+    conn = sqlite3.connect(store_db_path(current_store.get()), factory=factory, **kwargs)
     conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_BYTES}")
+    conn.execute(f"PRAGMA temp_store = {DB_TEMP_STORE}")
+    return conn
+
+_thread_connections = threading.local()
+
+# Connection to the current store's database, cached per thread and database file
+def get_db_connection():
+    if not hasattr(_thread_connections, "by_path"):
+        _thread_connections.by_path = {}
+    path = store_db_path(current_store.get())
+    conn = _thread_connections.by_path.get(path)
+    if conn is None:
+        conn = open_db_connection(factory=PooledConnection)
+        _thread_connections.by_path[path] = conn
     return conn
 
-# Initialize database
+# Money is stored as integer paise so sums are exact; amounts are converted to
+# rupees only when a response is built
+TRANSACTIONS_TABLE = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    customer_name TEXT NOT NULL,
+    sales INTEGER DEFAULT 0,
+    cash INTEGER DEFAULT 0,
+    hdfc INTEGER DEFAULT 0,
+    gpay INTEGER DEFAULT 0,
+    payment INTEGER DEFAULT 0,
+    transaction_type TEXT CHECK(transaction_type IN ('sale', 'repayment', 'expense')),
+    outstanding INTEGER DEFAULT 0,
+    related_credit_id INTEGER,
+    open_amount INTEGER DEFAULT 0,
+    customer_id INTEGER,
+    FOREIGN KEY (related_credit_id) REFERENCES transactions(id),
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+)
+'''
+
+# Amount columns of transactions, all in paise
+MONEY_COLUMNS = ['sales', 'cash', 'hdfc', 'gpay', 'payment', 'outstanding', 'open_amount']
+
+# Create or migrate the schema; safe to run on every start
 def init_db():
+    os.makedirs(os.path.dirname(store_db_path(current_store.get())) or ".", exist_ok=True)
     conn = get_db_connection()
     cursor = conn.cursor()
 
     # Create transactions table
+    cursor.execute(TRANSACTIONS_TABLE.format(name='transactions'))
+
+    # Columns added after the table was first released
+    allocation_added = ensure_column(cursor, 'transactions', 'open_amount', 'INTEGER DEFAULT 0')
+    ensure_column(cursor, 'transactions', 'customer_id', 'INTEGER REFERENCES customers(id)')
+
+    # Create customers table; sheet names that differ only in case or spacing share a row
     cursor.execute('''
-    CREATE TABLE IF NOT EXISTS transactions (
+    CREATE TABLE IF NOT EXISTS customers (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT NOT NULL,
-        customer_name TEXT NOT NULL,
-        sales REAL DEFAULT 0,
-        cash REAL DEFAULT 0,
-        hdfc REAL DEFAULT 0,
-        gpay REAL DEFAULT 0,
-        payment REAL DEFAULT 0,
-        transaction_type TEXT CHECK(transaction_type IN ('sale', 'repayment', 'expense')),
-        outstanding REAL DEFAULT 0,
-        related_credit_id INTEGER,
-        FOREIGN KEY (related_credit_id) REFERENCES transactions(id)
+        name TEXT NOT NULL,
+        normalized_name TEXT NOT NULL UNIQUE
     )
     ''')
 
-    # Create index on customer_name for faster lookups
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customer_name ON transactions(customer_name)')
+    # Trigram index over normalized names for substring autocomplete
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts
+    USING fts5(normalized_name, content='customers', content_rowid='id', tokenize='trigram')
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS customers_fts_insert AFTER INSERT ON customers BEGIN
+        INSERT INTO customers_fts (rowid, normalized_name) VALUES (new.id, new.normalized_name);
+    END
+    ''')
+
+    # Link rows stored before customers existed, while the name index is still there
+    cursor.execute("SELECT DISTINCT customer_name FROM transactions WHERE customer_id IS NULL")
+    unlinked = [row['customer_name'] for row in cursor.fetchall()]
+    if unlinked:
+        customer_ids = resolve_customer_ids(conn, unlinked)
+        cursor.executemany(
+            "UPDATE transactions SET customer_id = ? WHERE customer_name = ? AND customer_id IS NULL",
+            [(customer_id, name) for name, customer_id in customer_ids.items()]
+        )
+
+    # Databases from before paise storage keep rupees in REAL columns; copy them into
+    # the integer table and let the derived tables be rebuilt from it
+    cursor.execute("PRAGMA table_info(transactions)")
+    if {row['name']: row['type'] for row in cursor.fetchall()}['sales'] == 'REAL':
+        migrate_money_to_paise(cursor)
+
+    # Per-customer queries go through customer_id; the name indexes are no longer used
+    cursor.execute('DROP INDEX IF EXISTS idx_customer_name')
+    cursor.execute('DROP INDEX IF EXISTS idx_customer_date')
+    cursor.execute('DROP INDEX IF EXISTS idx_open_sales')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_date ON transactions(date)')
 
+    # Covers a day's count per transaction type, already grouped in index order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_date_type ON transactions(date, transaction_type)')
+
+    # Transaction lists filtered by type, newest first within an optional date range
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_type_date ON transactions(transaction_type, date)')
+
+    # Lets per-customer pages walk (date, id) in index order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customer_id_date ON transactions(customer_id, date)')
+
+    # A customer's sales that are still unpaid, oldest first
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customer_open_sales ON transactions(customer_id, date) WHERE transaction_type = 'sale' AND open_amount > 0")
+
+    # Rows of closed months, moved out of transactions with their ids by close_months
+    cursor.execute(TRANSACTIONS_TABLE.format(name='transactions_archive'))
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_date ON transactions_archive(date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_customer_date ON transactions_archive(customer_id, date)')
+    cursor.execute('''
+    CREATE VIEW IF NOT EXISTS all_transactions AS
+    SELECT * FROM transactions UNION ALL SELECT * FROM transactions_archive
+    ''')
+
+    # Per-month, per-customer totals of the archived rows, read with the live rows
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_month_summaries (
+        customer_id INTEGER NOT NULL REFERENCES customers(id),
+        month TEXT NOT NULL,
+        transactions INTEGER DEFAULT 0,
+        sales INTEGER DEFAULT 0,
+        cash INTEGER DEFAULT 0,
+        hdfc INTEGER DEFAULT 0,
+        gpay INTEGER DEFAULT 0,
+        payment INTEGER DEFAULT 0,
+        outstanding INTEGER DEFAULT 0,
+        repaid INTEGER DEFAULT 0,
+        first_date TEXT,
+        last_date TEXT,
+        PRIMARY KEY (customer_id, month)
+    )
+    ''')
+
+    # Closed months; every date before the month after the latest one is frozen
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS month_closes (
+        month TEXT PRIMARY KEY,
+        rows_archived INTEGER,
+        rows_kept_open INTEGER,
+        closed_at TEXT NOT NULL
+    )
+    ''')
+
+    # Allocation state at the latest close: the unpaid amount of each sale kept
+    # open, and each customer's credit not yet applied to a sale
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS opening_sales (
+        id INTEGER PRIMARY KEY REFERENCES transactions(id),
+        customer_id INTEGER NOT NULL,
+        open_amount INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_opening_sales_customer ON opening_sales(customer_id)')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_openings (
+        customer_id INTEGER PRIMARY KEY REFERENCES customers(id),
+        credit INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+
+    # Create per-day rollup table read by the report endpoints
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        date TEXT PRIMARY KEY,
+        total_sales INTEGER DEFAULT 0,
+        total_cash INTEGER DEFAULT 0,
+        total_hdfc INTEGER DEFAULT 0,
+        total_gpay INTEGER DEFAULT 0,
+        total_expenses INTEGER DEFAULT 0,
+        total_outstanding INTEGER DEFAULT 0,
+        total_repaid INTEGER DEFAULT 0,
+        net_cash_flow INTEGER DEFAULT 0
+    )
+    ''')
+
+    # Derived per-customer tables were keyed by name before customers existed; rebuild them
+    cursor.execute("PRAGMA table_info(customer_balances)")
+    balance_columns = [row['name'] for row in cursor.fetchall()]
+    rekeyed = bool(balance_columns) and 'customer_id' not in balance_columns
+    if rekeyed:
+        cursor.execute('DROP TABLE customer_balances')
+        cursor.execute('DROP TABLE IF EXISTS customer_aging')
+
+    # Create per-customer balance ledger read by the credits endpoints
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_balances (
+        customer_id INTEGER PRIMARY KEY REFERENCES customers(id),
+        total_outstanding INTEGER DEFAULT 0,
+        first_date TEXT,
+        last_date TEXT,
+        oldest_open_date TEXT
+    )
+    ''')
+
+    # Only customers who still owe money are listed, longest unpaid first
+    cursor.execute('DROP INDEX IF EXISTS idx_open_balances')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_credit_aging ON customer_balances(oldest_open_date) WHERE total_outstanding > 0')
+
+    # Open sale amounts per customer and aging bucket, as of aging_state.as_of
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_aging (
+        customer_id INTEGER NOT NULL REFERENCES customers(id),
+        bucket TEXT NOT NULL,
+        open_amount INTEGER DEFAULT 0,
+        PRIMARY KEY (customer_id, bucket)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS aging_state (
+        id INTEGER PRIMARY KEY CHECK(id = 1),
+        as_of TEXT NOT NULL
+    )
+    ''')
+    cursor.execute("SELECT as_of FROM aging_state WHERE id = 1")
+    aging_missing = cursor.fetchone() is None
+    cursor.execute("INSERT OR IGNORE INTO aging_state (id, as_of) VALUES (1, ?)", (aging_today(),))
+
+    # Natural key of a sheet row; covers the per-date lookup used when a date is re-uploaded
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_natural_key ON transactions(date, customer_name, sales, cash, hdfc, gpay, payment)')
+
+    # Content hashes of the files whose rows are currently stored, one set per date
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS uploaded_files (
+        sha256 TEXT PRIMARY KEY,
+        filename TEXT,
+        date TEXT NOT NULL,
+        rows INTEGER,
+        uploaded_at TEXT NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_uploaded_files_date ON uploaded_files(date)')
+
+    # Single-row counter bumped by every write that changes report data
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY CHECK(id = 1),
+        version INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO data_version (id, version, updated_at) VALUES (1, 0, ?)", (datetime.now().isoformat(),))
+
+    # Create background upload jobs table; the file is kept until the job finishes
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS upload_jobs (
+        id TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        status TEXT NOT NULL CHECK(status IN ('queued', 'running', 'done', 'failed')),
+        contents BLOB,
+        date TEXT,
+        rows_total INTEGER,
+        rows_processed INTEGER DEFAULT 0,
+        error TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    )
+    ''')
+
+    # Unfinished jobs in the order they were queued, resumed at startup
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_upload_jobs_pending ON upload_jobs(created_at) WHERE status IN ('queued', 'running')")
+
+    # Backfill derived tables for databases created before they existed
+    cursor.execute('''
+    SELECT 
+        EXISTS (SELECT 1 FROM transactions) AS has_transactions,
+        EXISTS (SELECT 1 FROM daily_rollups) AS has_rollups,
+        EXISTS (SELECT 1 FROM customer_balances) AS has_balances
+    ''')
+    state = cursor.fetchone()
+    if state['has_transactions'] and not state['has_rollups']:
+        refresh_daily_rollups(conn)
+    if state['has_transactions'] and (not state['has_balances'] or allocation_added or rekeyed):
+        refresh_customer_balances(conn)
+    elif state['has_transactions'] and aging_missing:
+        refresh_customer_aging(conn)
+
     conn.commit()
     conn.close()
 
-# Initialize database on startup
-init_db()
+# Rebuild transactions with integer paise amounts, keeping ids. The derived tables
+# hold rupee totals too, so they are dropped and backfilled by init_db.
+def migrate_money_to_paise(cursor):
+    cursor.execute("DROP TABLE IF EXISTS transactions_paise")
+    cursor.execute(TRANSACTIONS_TABLE.format(name='transactions_paise'))
+
+    columns = [row['name'] for row in cursor.execute("PRAGMA table_info(transactions_paise)").fetchall()]
+    converted = [
+        f"CAST(ROUND(COALESCE({column}, 0) * 100) AS INTEGER)" if column in MONEY_COLUMNS else column
+        for column in columns
+    ]
+    cursor.execute(f'''
+    INSERT INTO transactions_paise ({', '.join(columns)})
+    SELECT {', '.join(converted)} FROM transactions
+    ''')
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_paise RENAME TO transactions")
 
-# Process Excel file
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are allowed")
+    for table in ('daily_rollups', 'customer_balances', 'customer_aging'):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+# Add a column to an existing table if it is missing; returns whether it was added
+def ensure_column(cursor, table, column, definition):
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column in [row['name'] for row in cursor.fetchall()]:
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
 
+# Mark report data as changed; the caller owns the transaction
+def bump_data_version(conn):
+    conn.execute("UPDATE data_version SET version = version + 1, updated_at = ? WHERE id = 1", (datetime.now().isoformat(),))
+
+def read_data_version():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT version, updated_at FROM data_version WHERE id = 1")
+    row = cursor.fetchone()
+    conn.close()
+    return row['version'], datetime.fromisoformat(row['updated_at'])
+
+# Aggregate raw transactions into daily_rollups rows
+ROLLUP_SELECT = '''
+SELECT 
+    date,
+    SUM(CASE WHEN transaction_type = 'sale' THEN sales ELSE 0 END),
+    SUM(cash),
+    SUM(hdfc),
+    SUM(gpay),
+    SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'repayment' THEN (cash + hdfc + gpay) ELSE 0 END),
+    (SUM(cash) + SUM(hdfc) + SUM(gpay)) - SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END)
+'''
+
+ROLLUP_INSERT = '''
+INSERT INTO daily_rollups 
+(date, total_sales, total_cash, total_hdfc, total_gpay, total_expenses, total_outstanding, total_repaid, net_cash_flow)
+'''
+
+# Recompute rollups for the given dates (or every date, archived ones included);
+# only open dates are written to, so their rows are all live. The caller owns the transaction.
+def refresh_daily_rollups(conn, dates=None):
+    if dates is None:
+        conn.execute("DELETE FROM daily_rollups")
+        conn.execute(ROLLUP_INSERT + ROLLUP_SELECT + " FROM all_transactions GROUP BY date")
+        return
+
+    params = [(date,) for date in set(dates)]
+    conn.executemany("DELETE FROM daily_rollups WHERE date = ?", params)
+    conn.executemany(ROLLUP_INSERT + ROLLUP_SELECT + " FROM transactions WHERE date = ? GROUP BY date", params)
+
+# Match each customer's repayments to their open sales, oldest first. Every sale
+# gets the amount still unpaid in open_amount, and every repayment points at the
+# oldest sale it paid toward through related_credit_id. Money received beyond
+# the open sales (or overpaid at the till) is carried forward to later sales.
+# Only rows whose allocation changed are written; the caller owns the transaction.
+def allocate_credits(conn, customers=None):
+    if customers is None:
+        customers = [row[0] for row in conn.execute("SELECT DISTINCT customer_id FROM transactions")]
+
+    open_updates = []
+    link_updates = []
+    for customer in set(customers):
+        rows, remaining, related, _, _ = allocate_customer(conn, customer)
+        for row in rows:
+            if row['transaction_type'] == 'sale':
+                if row['open_amount'] != remaining[row['id']]:
+                    open_updates.append((remaining[row['id']], row['id']))
+            elif row['related_credit_id'] != related[row['id']]:
+                link_updates.append((related[row['id']], row['id']))
+
+    conn.executemany("UPDATE transactions SET open_amount = ? WHERE id = ?", open_updates)
+    conn.executemany("UPDATE transactions SET related_credit_id = ? WHERE id = ?", link_updates)
+
+# Allocate one customer's live sales and repayments (only those dated before
+# `before`, if given). Sales kept open by a month close resume from their unpaid
+# amount at the close, and the credit carried over the close applies from the
+# first row after them. Returns the rows, each sale's unpaid amount, each
+# repayment's related sale, the credit left over and the sales still open.
+def allocate_customer(conn, customer, before=None):
+    query = '''
+    SELECT transactions.id, date, transaction_type, outstanding, cash + hdfc + gpay AS received,
+        transactions.open_amount, related_credit_id, opening_sales.open_amount AS opening
+    FROM transactions
+    LEFT JOIN opening_sales ON opening_sales.id = transactions.id
+    WHERE transactions.customer_id = ? AND transaction_type IN ('sale', 'repayment')
+    '''
+    params = [customer]
+    if before:
+        query += " AND date < ?"
+        params.append(before)
+    rows = conn.execute(query + " ORDER BY date, transactions.id", params).fetchall()
+
+    opening = conn.execute("SELECT credit FROM customer_openings WHERE customer_id = ?", (customer,)).fetchone()
+    carried = opening[0] if opening else 0
+
+    open_sales = deque()
+    remaining = {}
+    related = {}
+    credit = 0
+
+    # Pay off open sales oldest first; returns what is left over
+    def settle(amount):
+        while amount > 0 and open_sales:
+            sale_id = open_sales[0]
+            applied = min(amount, remaining[sale_id])
+            remaining[sale_id] -= applied
+            amount -= applied
+            if remaining[sale_id] == 0:
+                open_sales.popleft()
+        return max(amount, 0)
+
+    for row in rows:
+        if row['opening'] is not None:
+            remaining[row['id']] = row['opening']
+            open_sales.append(row['id'])
+            continue
+        credit += carried
+        carried = 0
+
+        if row['transaction_type'] == 'sale':
+            amount = row['outstanding'] or 0
+            remaining[row['id']] = 0
+            if amount <= 0:
+                # Paid more than the sale at the till: the extra pays off older sales like a repayment
+                credit += settle(-amount)
+                continue
+            applied = min(credit, amount)
+            credit -= applied
+            remaining[row['id']] = amount - applied
+            if remaining[row['id']] > 0:
+                open_sales.append(row['id'])
+            continue
+
+        related[row['id']] = open_sales[0] if open_sales else None
+        credit += settle(row['received'] or 0)
+
+    return rows, remaining, related, credit + carried, list(open_sales)
+
+# Aggregate live rows and the monthly summaries of archived ones into
+# customer_balances rows; {where} filters both sides
+BALANCE_SELECT = '''
+SELECT customer_id, SUM(balance), MIN(first_date), MAX(last_date), MIN(oldest_open_date)
+FROM (
+    SELECT 
+        customer_id,
+        SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) -
+        SUM(CASE WHEN transaction_type = 'repayment' THEN (cash + hdfc + gpay) ELSE 0 END) AS balance,
+        MIN(date) AS first_date,
+        MAX(date) AS last_date,
+        MIN(CASE WHEN transaction_type = 'sale' AND open_amount > 0 THEN date END) AS oldest_open_date
+    FROM transactions
+    {where}
+    GROUP BY customer_id
+    UNION ALL
+    SELECT customer_id, outstanding - repaid, first_date, last_date, NULL
+    FROM customer_month_summaries
+    {where}
+)
+GROUP BY customer_id
+'''
+
+BALANCE_INSERT = '''
+INSERT INTO customer_balances (customer_id, total_outstanding, first_date, last_date, oldest_open_date)
+'''
+
+# Reallocate payments and recompute balances for the given customer ids (or everyone);
+# the caller owns the transaction
+def refresh_customer_balances(conn, customers=None):
+    allocate_credits(conn, customers)
+
+    if customers is None:
+        conn.execute("DELETE FROM customer_balances")
+        conn.execute(BALANCE_INSERT + BALANCE_SELECT.format(where=""))
+        refresh_customer_aging(conn)
+        return
+
+    params = [{"customer_id": customer} for customer in set(customers)]
+    conn.executemany("DELETE FROM customer_balances WHERE customer_id = :customer_id", params)
+    conn.executemany(BALANCE_INSERT + BALANCE_SELECT.format(where="WHERE customer_id = :customer_id"), params)
+    refresh_customer_aging(conn, customers)
+
+# Receivables aging buckets as (label, minimum age in days); an open sale falls
+# in the last bucket whose minimum its age exceeds
+AGING_BUCKETS = [('0-30', None), ('31-60', 30), ('61-90', 60), ('90+', 90)]
+
+AGING_BUCKET_CASE = "CASE " + " ".join(
+    f"WHEN JULIANDAY(:as_of) - JULIANDAY(date) > {days} THEN '{label}'"
+    for label, days in reversed(AGING_BUCKETS) if days is not None
+) + f" ELSE '{AGING_BUCKETS[0][0]}' END"
+
+# Aggregate open sales into customer_aging rows. The partial index holds only open
+# sales; without the hint a full rebuild would walk every sale through idx_type_date.
+AGING_INSERT = f'''
+INSERT INTO customer_aging (customer_id, bucket, open_amount)
+SELECT customer_id, {AGING_BUCKET_CASE}, SUM(open_amount)
+FROM transactions INDEXED BY idx_customer_open_sales
+WHERE transaction_type = 'sale' AND open_amount > 0
+'''
+
+# Aging is bucketed against the local calendar date, like the response cache validators
+def aging_today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+# Recompute aging buckets for the given customer ids (or everyone) as of the stored
+# aging date, or as_of when given; the caller owns the transaction
+def refresh_customer_aging(conn, customers=None, as_of=None):
+    if as_of is None:
+        as_of = conn.execute("SELECT as_of FROM aging_state WHERE id = 1").fetchone()[0]
+
+    if customers is None:
+        conn.execute("DELETE FROM customer_aging")
+        conn.execute(AGING_INSERT + " GROUP BY 1, 2", {"as_of": as_of})
+        return
+
+    params = [{"as_of": as_of, "customer_id": customer} for customer in set(customers)]
+    conn.executemany("DELETE FROM customer_aging WHERE customer_id = :customer_id", params)
+    conn.executemany(AGING_INSERT + " AND customer_id = :customer_id GROUP BY 1, 2", params)
+
+# Move the aging buckets forward to today. Only customers with an open sale that
+# crossed a bucket boundary since the stored date are recomputed; after a long
+# gap (or if the clock went backwards) everything is. Returns whether anything
+# was rolled; the caller owns the transaction.
+def roll_aging_forward(conn, today=None):
+    today = today or aging_today()
+    as_of = conn.execute("SELECT as_of FROM aging_state WHERE id = 1").fetchone()[0]
+    if as_of == today:
+        return False
+
+    as_of_day = datetime.strptime(as_of, "%Y-%m-%d")
+    today_day = datetime.strptime(today, "%Y-%m-%d")
+    boundaries = [days for _, days in AGING_BUCKETS if days is not None]
+
+    if today_day < as_of_day or (today_day - as_of_day).days > max(boundaries):
+        refresh_customer_aging(conn, as_of=today)
+    else:
+        # A sale crosses the boundary at `days` when as_of - date <= days < today - date
+        windows = []
+        for days in boundaries:
+            windows += [(as_of_day - timedelta(days=days)).strftime("%Y-%m-%d"), (today_day - timedelta(days=days)).strftime("%Y-%m-%d")]
+        # Each window is its own range on idx_type_date; the few customers found are de-duplicated here
+        cursor = conn.execute(f'''
+        SELECT customer_id
+        FROM transactions
+        WHERE open_amount > 0
+        AND ({' OR '.join(["(transaction_type = 'sale' AND date >= ? AND date < ?)"] * len(boundaries))})
+        ''', windows)
+        customers = list({row[0] for row in cursor.fetchall()})
+        refresh_customer_aging(conn, customers, as_of=today)
+
+    conn.execute("UPDATE aging_state SET as_of = ? WHERE id = 1", (today,))
+    log_event(logging.INFO, "aging rolled forward", from_date=as_of, to_date=today)
+    return True
+
+# Roll aging forward in its own transaction if the date has changed. A report
+# cached just after midnight but before the roll is invalidated with the version.
+def roll_aging_to_today():
+    conn = get_db_connection()
     try:
-        # Read Excel file
-        df = pd.read_excel(file.file)
-
-        # Rename columns to match our schema
-        column_mapping = {
-            'Particulars': 'customer_name',
-            'SALES': 'sales',
-            'CASH': 'cash',
-            'kotak/hdfc': 'hdfc',
-            'G PAY': 'gpay',
-            'PAYMENT': 'payment'
-        }
-        
-        df = df.rename(columns=column_mapping)
-        print(df.columns)
-
-        # Extract date from the first row (assuming it's in the format DD-MM-YY)
-        date_str = None
-        for col in df.columns:
-            if isinstance(col, str) and "DATE" in col.upper():
-                date_str = col.split()[-1]
-                break
-        
-        if not date_str:
-            # Try to get date from first row
-            for col in df.columns:
-                if isinstance(df.iloc[0, df.columns.get_loc(col)], str):
-                    potential_date = df.iloc[0, df.columns.get_loc(col)]
-                    if isinstance(potential_date, str) and "-" in potential_date:
-                        date_str = potential_date
-                        break
-        
-        # If still no date, use today's date
-        if not date_str:
-            date_str = datetime.now().strftime("%d-%m-%y")
-        
-        # Convert date to ISO format (YYYY-MM-DD)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rolled = roll_aging_forward(conn)
+            if rolled:
+                bump_data_version(conn)
+            return rolled
+    finally:
+        conn.close()
+
+# Roll aging forward at startup and then just after each local midnight
+async def run_aging_rollover():
+    loop = asyncio.get_running_loop()
+    while True:
+        for store in STORES:
+            await loop.run_in_executor(db_executor, run_in_store, store, roll_aging_to_today)
+        now = datetime.now()
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=1, microsecond=0)
+        await asyncio.sleep((midnight - now).total_seconds())
+
+# First day of the month after a YYYY-MM month
+def month_after(month):
+    year, number = map(int, month.split("-"))
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}-01"
+
+# Rows dated before this day belong to closed months, or None if nothing is closed
+def closed_before(conn):
+    month = conn.execute("SELECT MAX(month) FROM month_closes").fetchone()[0]
+    return month_after(month) if month else None
+
+# Closed months are frozen; refuse writes to any of their dates
+def check_dates_open(conn, dates):
+    cutoff = closed_before(conn)
+    closed = sorted(date for date in set(dates) if cutoff and date < cutoff)
+    if closed:
+        raise HTTPException(status_code=409, detail=f"Months before {cutoff[:7]} are closed: {', '.join(closed)}")
+
+# Credit status bucketed by the age of the customer's oldest unpaid sale; a
+# customer with no unpaid sale owes nothing old and is in good standing
+CREDIT_COLUMNS = '''
+    customers.id as customer_id,
+    customers.name as customer_name,
+    total_outstanding / 100.0 as total_outstanding,
+    first_date,
+    last_date,
+    oldest_open_date,
+    COALESCE(JULIANDAY('now') - JULIANDAY(oldest_open_date), 0) as days_outstanding,
+    CASE 
+        WHEN JULIANDAY('now') - JULIANDAY(oldest_open_date) > 90 THEN 'Overdue'
+        WHEN JULIANDAY('now') - JULIANDAY(oldest_open_date) > 30 THEN 'Warning'
+        ELSE 'Good'
+    END as status
+'''
+
+# Lookup key for a customer: case-folded, with runs of whitespace collapsed
+def normalize_customer_name(name):
+    return " ".join(str(name).split()).casefold()
+
+# Find or create the customers for raw sheet names; returns {raw name: customer id}.
+# A new customer is displayed under the first spelling seen, with spacing tidied.
+def resolve_customer_ids(conn, names):
+    normalized = {name: normalize_customer_name(name) for name in set(names)}
+    conn.executemany(
+        "INSERT OR IGNORE INTO customers (name, normalized_name) VALUES (?, ?)",
+        [(" ".join(str(name).split()), key) for name, key in normalized.items()]
+    )
+
+    keys = list(set(normalized.values()))
+    ids = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        cursor = conn.execute(
+            f"SELECT normalized_name, id FROM customers WHERE normalized_name IN ({', '.join('?' * len(chunk))})",
+            chunk
+        )
+        ids.update(cursor.fetchall())
+    return {name: ids[key] for name, key in normalized.items()}
+
+# Attach customer ids to prepared rows, creating customers seen for the first time
+def with_customer_ids(conn, transactions):
+    customer_ids = resolve_customer_ids(conn, transactions['customer_name'].unique().tolist())
+    return transactions.assign(customer_id=transactions['customer_name'].map(customer_ids).astype('int64'))
+
+# Condition matching a customer by name however it was spelled in the sheet
+CUSTOMER_ID_BY_NAME = "customer_id = (SELECT id FROM customers WHERE normalized_name = ?)"
+
+# Columns written for each ingested row, in insert order
+INSERT_COLUMNS = ['date', 'customer_name', 'sales', 'cash', 'hdfc', 'gpay', 'payment', 'transaction_type', 'outstanding']
+AMOUNT_COLUMNS = ['sales', 'cash', 'hdfc', 'gpay', 'payment']
+
+# Classify cleaned sheet rows and compute outstanding without a Python loop.
+# Sheet amounts are rupees; they are stored as integer paise.
+def prepare_transactions(df, date_iso):
+    import numpy as np
+    import pandas as pd
+
+    rupees = df[AMOUNT_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0)
+    amounts = (rupees * 100).round().astype('int64')
+    received = amounts['cash'] + amounts['hdfc'] + amounts['gpay']
+
+    is_sale = amounts['sales'] > 0
+    is_repayment = ~is_sale & (received > 0) & (amounts['sales'] == 0)
+    is_expense = ~is_sale & ~is_repayment & (amounts['payment'] > 0)
+
+    transaction_type = np.select(
+        [is_sale, is_repayment, is_expense],
+        ['sale', 'repayment', 'expense'],
+        default=''
+    )
+    outstanding = np.where(is_sale, amounts['sales'] - received, 0)
+
+    prepared = amounts.assign(
+        date=date_iso,
+        customer_name=df['customer_name'],
+        transaction_type=transaction_type,
+        outstanding=outstanding
+    )
+    # Rows that are neither a sale, repayment nor expense are skipped
+    prepared = prepared[transaction_type != '']
+    return prepared[INSERT_COLUMNS]
+
+# Write prepared rows, with their customer ids attached, in a single executemany;
+# the caller owns the transaction
+def insert_transactions(conn, transactions):
+    rows = list(zip(*(transactions[col].tolist() for col in INSERT_COLUMNS + ['customer_id'])))
+    conn.executemany('''
+    INSERT INTO transactions 
+    (date, customer_name, sales, cash, hdfc, gpay, payment, transaction_type, outstanding, customer_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+# Sheet headers we read, mapped to our schema; every other column is ignored
+COLUMN_MAPPING = {
+    'Particulars': 'customer_name',
+    'SALES': 'sales',
+    'CASH': 'cash',
+    'kotak/hdfc': 'hdfc',
+    'G PAY': 'gpay',
+    'PAYMENT': 'payment'
+}
+
+UPLOAD_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+# Parse an uploaded file's first sheet into classified rows ready for insert.
+# Like a batch, an undated sheet is dated by its sheet name, or a CSV by its file name.
+def read_sheet(contents, filename):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    if filename.endswith('.csv'):
+        return read_csv_sheet(contents, date_hint=os.path.splitext(os.path.basename(filename))[0])
+    if filename.endswith('.xlsx'):
+        workbook = load_workbook(io.BytesIO(contents), read_only=True, data_only=True)
+        try:
+            worksheet = workbook.worksheets[0]
+            return stream_xlsx_sheet(worksheet, date_hint=worksheet.title)
+        finally:
+            workbook.close()
+    workbook = pd.ExcelFile(io.BytesIO(contents))
+    return clean_sheet(workbook.parse(0), date_hint=workbook.sheet_names[0])
+
+# Parse several sheets of one file, opening it once; each sheet's name is used
+# as its date when the sheet itself does not carry one
+def read_workbook_sheets(contents, filename, sheet_names):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    if filename.endswith('.csv'):
+        return [read_csv_sheet(contents, date_hint=sheet_names[0])]
+    if filename.endswith('.xlsx'):
+        workbook = load_workbook(io.BytesIO(contents), read_only=True, data_only=True)
         try:
-            date_obj = datetime.strptime(date_str, "%d-%m-%y")
-        except ValueError:
+            return [stream_xlsx_sheet(workbook[name], date_hint=name) for name in sheet_names]
+        finally:
+            workbook.close()
+    workbook = pd.ExcelFile(io.BytesIO(contents))
+    return [clean_sheet(workbook.parse(name), date_hint=name) for name in sheet_names]
+
+# A CSV has one "sheet", named after the file so a POS export like 01-04-24.csv dates itself
+def list_workbook_sheets(contents, filename):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    if filename.endswith('.csv'):
+        return [os.path.splitext(os.path.basename(filename))[0]]
+    if filename.endswith('.xlsx'):
+        workbook = load_workbook(io.BytesIO(contents), read_only=True)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+    return pd.ExcelFile(io.BytesIO(contents)).sheet_names
+
+# Read an .xlsx sheet row by row, keeping only the mapped columns and dropping
+# rows with no amounts as they are read instead of after building a full frame
+def stream_xlsx_sheet(worksheet, date_hint=None):
+    import pandas as pd
+
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, ())
+
+    positions = [i for i, name in enumerate(header) if name in COLUMN_MAPPING]
+    columns = [COLUMN_MAPPING[header[i]] for i in positions]
+    amount_positions = [i for i in positions if COLUMN_MAPPING[header[i]] != 'customer_name']
+
+    records = []
+    first_row = None
+    for row in rows:
+        if first_row is None:
+            first_row = row
+        if not any(row[i] for i in amount_positions if i < len(row)):
+            continue
+        records.append([row[i] if i < len(row) else None for i in positions])
+
+    date_iso = find_sheet_date(header, first_row or (), date_hint)
+    return finish_sheet(pd.DataFrame(records, columns=columns), date_iso)
+
+# Read a CSV export, parsing only the mapped columns and any DATE column
+def read_csv_sheet(contents, date_hint=None):
+    import pandas as pd
+
+    df = pd.read_csv(
+        io.BytesIO(contents),
+        usecols=lambda name: name in COLUMN_MAPPING or "DATE" in name.upper()
+    )
+    return clean_sheet(df, date_hint=date_hint)
+
+# Turn a raw sheet into classified rows and the ISO date they belong to
+def clean_sheet(df, date_hint=None):
+    # Rename columns to match our schema
+    df = df.rename(columns=COLUMN_MAPPING)
+    log_event(logging.DEBUG, "sheet columns", columns=list(df.columns))
+
+    first_row = list(df.iloc[0]) if len(df) else []
+    date_iso = find_sheet_date(list(df.columns), first_row, date_hint)
+    return finish_sheet(df, date_iso)
+
+# Raised in the parse process when a sheet's date cannot be found
+class SheetDateError(ValueError):
+    pass
+
+# Work out which day a sheet is for from its header, first row or sheet name.
+# Storing a sheet replaces its date's rows, so a sheet without a date is refused
+# rather than guessed
+def find_sheet_date(header, first_row, date_hint=None):
+    candidates = []
+    # Header like "DATE 01-04-24"
+    for col in header:
+        if isinstance(col, str) and "DATE" in col.upper():
+            candidates.append(col.split()[-1])
+            break
+    # A date in the first row
+    candidates.extend(value for value in first_row if isinstance(value, str) and "-" in value)
+    # The sheet or file name
+    if date_hint and "-" in str(date_hint):
+        candidates.append(str(date_hint).strip())
+
+    # Convert date to ISO format (YYYY-MM-DD)
+    for date_str in candidates:
+        for date_format in ("%d-%m-%y", "%d-%m-%Y"):
             try:
-                date_obj = datetime.strptime(date_str, "%d-%m-%Y")
+                return datetime.strptime(date_str.strip(), date_format).strftime("%Y-%m-%d")
             except ValueError:
-                date_obj = datetime.now()
-        
-        date_iso = date_obj.strftime("%Y-%m-%d")
-
-        # Clean up the dataframe
-        # 1. Keep only required columns
-        required_cols = ['customer_name', 'sales', 'cash', 'hdfc', 'gpay', 'payment']
-        for col in required_cols:
-            if col not in df.columns:
-                df[col] = 0
-        
-        df = df[required_cols]
+                continue
 
-        # 2. Remove rows where all numeric columns are NaN or 0
-        df = df.fillna(0)
-        df = df[(df['sales'] != 0) | (df['cash'] != 0) | (df['hdfc'] != 0) | (df['gpay'] != 0) | (df['payment'] != 0)]
-        
-        # 3. Remove rows with empty customer_name
-        df = df[df['customer_name'].notna() & (df['customer_name'] != '')]
+    sheet = f"Sheet {date_hint!r}" if date_hint else "Sheet"
+    raise SheetDateError(
+        f"{sheet} has no date: add a 'DATE DD-MM-YY' column or name the sheet or file after its date"
+    )
 
+# Drop unusable rows and classify the rest
+def finish_sheet(df, date_iso):
+    # Clean up the dataframe
+    # 1. Keep only required columns
+    required_cols = ['customer_name', 'sales', 'cash', 'hdfc', 'gpay', 'payment']
+    for col in required_cols:
+        if col not in df.columns:
+            df[col] = 0
+    
+    df = df[required_cols]
 
-        # Process each row and insert into database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        rows_processed = 0
-        
-        for _, row in df.iterrows():
-            # Determine transaction type and calculate outstanding
-            sales = float(row['sales']) if row['sales'] else 0
-            cash = float(row['cash']) if row['cash'] else 0
-            hdfc = float(row['hdfc']) if row['hdfc'] else 0
-            gpay = float(row['gpay']) if row['gpay'] else 0
-            payment = float(row['payment']) if row['payment'] else 0
-            
-            received = cash + hdfc + gpay
-            outstanding = 0
-            transaction_type = None
-            
-            if sales > 0:
-                transaction_type = 'sale'
-                outstanding = sales - received
-            elif received > 0 and sales == 0:
-                transaction_type = 'repayment'
-            elif payment > 0:
-                transaction_type = 'expense'
-            else:
-                continue
-            
-            # Insert into database
-            print(sales, cash, hdfc, gpay, payment, transaction_type, outstanding)
-            cursor.execute('''
-            INSERT INTO transactions 
-            (date, customer_name, sales, cash, hdfc, gpay, payment, transaction_type, outstanding)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (date_iso, row['customer_name'], sales, cash, hdfc, gpay, payment, transaction_type, outstanding))
-            
-            rows_processed += 1
-        
-        conn.commit()
+    # 2. Remove rows where all numeric columns are NaN or 0
+    df = df.fillna(0)
+    df = df[(df['sales'] != 0) | (df['cash'] != 0) | (df['hdfc'] != 0) | (df['gpay'] != 0) | (df['payment'] != 0)]
+    
+    # 3. Remove rows with empty customer_name
+    df = df[df['customer_name'].notna() & (df['customer_name'] != '')]
+
+    # Classify rows column-wise
+    return prepare_transactions(df, date_iso), date_iso
+
+# Insert classified rows and refresh the derived tables they touch; the caller owns the transaction
+def write_transactions(conn, transactions):
+    transactions = with_customer_ids(conn, transactions)
+    rows_processed = insert_transactions(conn, transactions)
+    refresh_daily_rollups(conn, transactions['date'].unique().tolist())
+    refresh_customer_balances(conn, transactions['customer_id'].unique().tolist())
+    return rows_processed
+
+# Columns that identify a sheet row when a date is uploaded again
+NATURAL_KEY = ['customer_name', 'sales', 'cash', 'hdfc', 'gpay', 'payment']
+
+# Make the rows stored for a date match a re-uploaded sheet. Rows present in both
+# are kept as they are; only the difference is deleted or inserted. Returns the
+# ids of customers whose rows changed so the caller can refresh just their balances.
+# The caller owns the transaction.
+def replace_date_transactions(conn, transactions, date_iso):
+    keys = list(zip(*(transactions[col].tolist() for col in NATURAL_KEY)))
+    unmatched = Counter(keys)
+
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, customer_name, sales, cash, hdfc, gpay, payment, customer_id FROM transactions WHERE date = ?",
+        (date_iso,)
+    )
+
+    stale_ids = []
+    customers = set()
+    for row in cursor.fetchall():
+        key = tuple(row)[1:-1]
+        if unmatched[key] > 0:
+            unmatched[key] -= 1
+        else:
+            stale_ids.append((row['id'],))
+            customers.add(row['customer_id'])
+
+    # Whatever is still unmatched is new; take that many rows of each key from the sheet
+    is_new = []
+    for key in keys:
+        is_new.append(unmatched[key] > 0)
+        if unmatched[key] > 0:
+            unmatched[key] -= 1
+    new_rows = with_customer_ids(conn, transactions[is_new])
+    customers.update(new_rows['customer_id'].tolist())
+
+    conn.executemany("DELETE FROM transactions WHERE id = ?", stale_ids)
+    insert_transactions(conn, new_rows)
+
+    return len(new_rows), len(stale_ids), customers
+
+# Remember the file that now defines a date, forgetting earlier files for it
+def record_uploaded_file(conn, file_hash, filename, date_iso, rows):
+    conn.execute("DELETE FROM uploaded_files WHERE date = ?", (date_iso,))
+    conn.execute(
+        "INSERT OR REPLACE INTO uploaded_files (sha256, filename, date, rows, uploaded_at) VALUES (?, ?, ?, ?, ?)",
+        (file_hash, filename, date_iso, rows, datetime.now().isoformat())
+    )
+
+def find_uploaded_file(file_hash):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT date, rows FROM uploaded_files WHERE sha256 = ?", (file_hash,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def find_uploaded_files(file_hashes):
+    conn = get_db_connection()
+    known = known_file_hashes(conn, file_hashes)
+    conn.close()
+    return known
+
+def date_has_transactions(date_iso):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM transactions WHERE date = ?)", (date_iso,))
+    exists = bool(cursor.fetchone()[0])
+    conn.close()
+    return exists
+
+# Hashes among file_hashes already recorded in uploaded_files, with their dates
+def known_file_hashes(conn, file_hashes):
+    cursor = conn.execute(
+        f"SELECT sha256, date FROM uploaded_files WHERE sha256 IN ({', '.join('?' * len(file_hashes))})",
+        list(file_hashes)
+    )
+    return {row['sha256']: row['date'] for row in cursor.fetchall()}
+
+# Store parsed sheets, each as the contents of its date, in one transaction.
+# sheets is a list of (transactions, date_iso, file_hash, filename); derived
+# tables are refreshed once for everything the batch touched. The write lock is
+# taken before anything is read, so a concurrent upload of the same file finds
+# it already recorded; such sheets come back as None instead of (added, removed).
+def store_sheets(sheets, job_id=None):
+    conn = get_db_connection()
+    results = []
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            roll_aging_forward(conn)
+            known = known_file_hashes(conn, [sheet[2] for sheet in sheets])
+            check_dates_open(conn, [sheet[1] for sheet in sheets if sheet[2] not in known])
+            dates = set()
+            customers = set()
+            for transactions, date_iso, file_hash, filename in sheets:
+                if file_hash in known:
+                    results.append(None)
+                    continue
+                added, removed, touched = replace_date_transactions(conn, transactions, date_iso)
+                record_uploaded_file(conn, file_hash, filename, date_iso, len(transactions))
+                if added or removed:
+                    dates.add(date_iso)
+                    customers.update(touched)
+                results.append((added, removed))
+
+            if dates:
+                refresh_daily_rollups(conn, dates)
+                refresh_customer_balances(conn, customers)
+                bump_data_version(conn)
+
+            if job_id:
+                rows_processed = sum(len(sheet[0]) for sheet in sheets if sheet[2] not in known)
+                conn.execute("UPDATE upload_jobs SET rows_processed = ? WHERE id = ?", (rows_processed, job_id))
+    finally:
         conn.close()
+
+    return results
+
+# Store a single parsed sheet as the contents of its date; None if the file is already stored
+def store_sheet(transactions, date_iso, file_hash, filename, job_id=None):
+    return store_sheets([(transactions, date_iso, file_hash, filename)], job_id=job_id)[0]
+
+# A chunked job writes its date one piece at a time, so another upload can
+# replace the date between two chunks. Stop the job if a file has been recorded
+# for the date since it started, or if the date holds rows it did not write.
+# The caller holds the write lock.
+def check_upload_job_owns_date(conn, job_id):
+    job = conn.execute("SELECT date, rows_processed, started_at FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+    replaced = conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM uploaded_files WHERE date = ? AND uploaded_at >= ?)", (job['date'], job['started_at'])
+    ).fetchone()[0]
+    rows = conn.execute("SELECT COUNT(*) FROM transactions WHERE date = ?", (job['date'],)).fetchone()[0]
+    if replaced or rows != (job['rows_processed'] or 0):
+        raise HTTPException(status_code=409, detail=f"{job['date']} was changed by another upload while this job was storing it")
+
+# Record the file once the last chunk of a job is in
+def finish_upload_job_file(job_id, file_hash, filename, date_iso, rows):
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            check_upload_job_owns_date(conn, job_id)
+            record_uploaded_file(conn, file_hash, filename, date_iso, rows)
+    finally:
+        conn.close()
+
+# Rows committed per transaction by a background upload job
+UPLOAD_JOB_CHUNK_ROWS = int(os.environ.get("CREDIT_UPLOAD_CHUNK_ROWS", "5000"))
+
+def update_upload_job(job_id, **fields):
+    conn = get_db_connection()
+    try:
+        with conn:
+            assignments = ", ".join(f"{field} = ?" for field in fields)
+            conn.execute(f"UPDATE upload_jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+    finally:
+        conn.close()
+
+def create_upload_job(filename, contents):
+    job_id = uuid.uuid4().hex
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO upload_jobs (id, filename, status, contents, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, filename, contents, datetime.now().isoformat())
+            )
+    finally:
+        conn.close()
+    return job_id
+
+# Jobs a previous run left unfinished, oldest first; running ones resume where they stopped
+def pending_upload_jobs():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM upload_jobs WHERE status IN ('queued', 'running') ORDER BY created_at")
+    job_ids = [row['id'] for row in cursor.fetchall()]
+    conn.close()
+    return job_ids
+
+def load_upload_job(job_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT filename, contents, rows_processed, started_at FROM upload_jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+# Commit one chunk of a job together with its progress, so a restart resumes
+# exactly. Returns False without writing if the file was stored meanwhile, and
+# fails if another upload changed the date.
+def store_upload_job_chunk(job_id, chunk, rows_processed, file_hash):
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            roll_aging_forward(conn)
+            if known_file_hashes(conn, [file_hash]):
+                return False
+            check_upload_job_owns_date(conn, job_id)
+            check_dates_open(conn, chunk['date'].unique().tolist())
+            write_transactions(conn, chunk)
+            bump_data_version(conn)
+            conn.execute("UPDATE upload_jobs SET rows_processed = ? WHERE id = ?", (rows_processed, job_id))
+            return True
+    finally:
+        conn.close()
+
+async def process_upload_job(job_id):
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(db_executor, load_upload_job, job_id)
+    rows_processed = job['rows_processed'] or 0
+
+    try:
+        await loop.run_in_executor(db_executor, functools.partial(
+            update_upload_job, job_id,
+            status='running', started_at=job['started_at'] or datetime.now().isoformat()
+        ))
+
+        file_hash = hashlib.sha256(job['contents']).hexdigest()
+        transactions, date_iso = await loop.run_in_executor(parse_executor, read_sheet, job['contents'], job['filename'])
+        await loop.run_in_executor(db_executor, functools.partial(
+            update_upload_job, job_id, date=date_iso, rows_total=len(transactions)
+        ))
+
+        fresh_start = rows_processed == 0
+        duplicate = False
+        if fresh_start and await loop.run_in_executor(db_executor, date_has_transactions, date_iso):
+            # A re-uploaded date is replaced in one transaction rather than in chunks
+            stored = await loop.run_in_executor(db_executor, functools.partial(
+                store_sheet, transactions, date_iso, file_hash, job['filename'], job_id=job_id
+            ))
+            duplicate = stored is None
+        else:
+            for start in range(rows_processed, len(transactions), UPLOAD_JOB_CHUNK_ROWS):
+                chunk = transactions.iloc[start:start + UPLOAD_JOB_CHUNK_ROWS]
+                if not await loop.run_in_executor(
+                    db_executor, store_upload_job_chunk, job_id, chunk, start + len(chunk), file_hash
+                ):
+                    duplicate = True
+                    break
+            else:
+                await loop.run_in_executor(
+                    db_executor, finish_upload_job_file, job_id, file_hash, job['filename'], date_iso, len(transactions)
+                )
+        if duplicate:
+            log_event(logging.INFO, "upload job duplicate", job_id=job_id, filename=job['filename'], date=date_iso)
+
+        await loop.run_in_executor(db_executor, functools.partial(
+            update_upload_job, job_id,
+            status='done', contents=None, finished_at=datetime.now().isoformat()
+        ))
+        log_event(logging.INFO, "upload job done", job_id=job_id, filename=job['filename'], rows=len(transactions))
+    except Exception as e:
+        logger.exception("upload job failed", extra={"fields": {"job_id": job_id, "filename": job['filename']}})
+        await loop.run_in_executor(db_executor, functools.partial(
+            update_upload_job, job_id,
+            status='failed', contents=None, error=str(e), finished_at=datetime.now().isoformat()
+        ))
+
+# Process one store's queued upload jobs one at a time, starting with any left
+# over from a restart
+async def run_upload_jobs(store, queue):
+    current_store.set(store)
+    loop = asyncio.get_running_loop()
+    for job_id in await loop.run_in_executor(db_executor, pending_upload_jobs):
+        queue.put_nowait(job_id)
+
+    while True:
+        job_id = await queue.get()
+        await process_upload_job(job_id)
+
+# Process Excel file, or queue it as a background job with ?background=true
+@app.post("/api/upload")
+async def upload_file(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    background: bool = False
+):
+    if not file.filename.endswith(UPLOAD_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Only Excel (.xlsx, .xls) or CSV files are allowed")
+
+    try:
+        contents = await file.read()
+        loop = asyncio.get_running_loop()
+
+        # A file identical to one already stored is acknowledged without parsing
+        file_hash = hashlib.sha256(contents).hexdigest()
+        uploaded = await loop.run_in_executor(db_executor, find_uploaded_file, file_hash)
+        if uploaded:
+            log_event(logging.INFO, "upload duplicate", filename=file.filename, date=uploaded['date'])
+            return {"status": "duplicate", "rows_processed": 0, "date": uploaded['date']}
+
+        if background:
+            job_id = await loop.run_in_executor(db_executor, create_upload_job, file.filename, contents)
+            request.app.state.upload_queues[current_store.get()].put_nowait(job_id)
+            response.status_code = 202
+            return {"status": "queued", "job_id": job_id}
+
+        # Parsing and the database write each run on their own pool
+        transactions, date_iso = await loop.run_in_executor(parse_executor, read_sheet, contents, file.filename)
+        stored = await loop.run_in_executor(
+            db_executor, store_sheet, transactions, date_iso, file_hash, file.filename
+        )
+        if stored is None:
+            # The same file was stored by a concurrent upload while this one was parsed
+            log_event(logging.INFO, "upload duplicate", filename=file.filename, date=date_iso)
+            return {"status": "duplicate", "rows_processed": 0, "date": date_iso}
+
+        rows_added, rows_removed = stored
+        log_event(
+            logging.INFO, "upload stored", filename=file.filename, date=date_iso,
+            rows=len(transactions), rows_added=rows_added, rows_removed=rows_removed
+        )
         
-        return {"status": "success", "rows_processed": rows_processed, "date": date_iso}
+        return {
+            "status": "success",
+            "rows_processed": len(transactions),
+            "rows_added": rows_added,
+            "rows_removed": rows_removed,
+            "date": date_iso
+        }
 
+    except HTTPException:
+        raise
+    except SheetDateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        logger.exception("upload failed", extra={"fields": {"filename": file.filename}})
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
-# Get all transactions
-@app.get("/api/transactions")
-async def get_transactions(
-    from_date: Optional[str] = None,
-    to_date: Optional[str] = None,
-    customer_name: Optional[str] = None,
-    transaction_type: Optional[str] = None
-):    
+# Split a workbook's sheets into at most PARSE_WORKERS groups so they parse in parallel
+def parse_groups(sheet_names):
+    size = -(-len(sheet_names) // PARSE_WORKERS)
+    return [sheet_names[i:i + size] for i in range(0, len(sheet_names), size)]
+
+# Process many workbooks, or workbooks with one sheet per day, in one request.
+# Sheets are parsed in parallel on the process pool and stored in one transaction.
+@app.post("/api/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    for file in files:
+        if not file.filename.endswith(UPLOAD_EXTENSIONS):
+            raise HTTPException(status_code=400, detail=f"Only Excel (.xlsx, .xls) or CSV files are allowed: {file.filename}")
+
+    try:
+        loop = asyncio.get_running_loop()
+        workbooks = [(file.filename, await file.read()) for file in files]
+        sheet_lists = await asyncio.gather(*(
+            loop.run_in_executor(parse_executor, list_workbook_sheets, contents, filename)
+            for filename, contents in workbooks
+        ))
+
+        # One unit per sheet; a single-sheet workbook keeps the plain file hash
+        # so it matches what /api/upload records for the same file
+        units = []
+        workbook_units = []
+        for (filename, contents), sheet_names in zip(workbooks, sheet_lists):
+            file_hash = hashlib.sha256(contents).hexdigest()
+            sheets_of_workbook = []
+            for sheet_name in sheet_names:
+                if len(sheet_names) == 1:
+                    unit_hash = file_hash
+                else:
+                    unit_hash = hashlib.sha256(f"{file_hash}:{sheet_name}".encode()).hexdigest()
+                sheets_of_workbook.append({"file": filename, "sheet": sheet_name, "hash": unit_hash})
+            units.extend(sheets_of_workbook)
+            workbook_units.append((filename, contents, sheets_of_workbook))
+
+        known = await loop.run_in_executor(db_executor, find_uploaded_files, [unit["hash"] for unit in units])
+
+        # Parse every sheet that is not already stored, grouped per workbook
+        tasks = []
+        groups = []
+        for filename, contents, sheets_of_workbook in workbook_units:
+            pending = [unit for unit in sheets_of_workbook if unit["hash"] not in known]
+            if not pending:
+                continue
+            for group in parse_groups(pending):
+                groups.append(group)
+                tasks.append(loop.run_in_executor(
+                    parse_executor, read_workbook_sheets, contents, filename, [unit["sheet"] for unit in group]
+                ))
+
+        sheets = []
+        for group, parsed in zip(groups, await asyncio.gather(*tasks)):
+            for unit, (transactions, date_iso) in zip(group, parsed):
+                unit["transactions"] = transactions
+                unit["date"] = date_iso
+                sheets.append(unit)
+
+        # Storing a sheet replaces its date, so two sheets for one date would
+        # leave only the last; refuse the batch instead
+        sheets_by_date = {}
+        for unit in sheets:
+            sheets_by_date.setdefault(unit["date"], []).append(f"{unit['file']} ({unit['sheet']})")
+        clashes = [f"{date_iso}: {', '.join(names)}" for date_iso, names in sorted(sheets_by_date.items()) if len(names) > 1]
+        if clashes:
+            raise HTTPException(status_code=409, detail=f"Several sheets have the same date: {'; '.join(clashes)}")
+
+        stored = await loop.run_in_executor(db_executor, store_sheets, [
+            (unit["transactions"], unit["date"], unit["hash"], unit["file"]) for unit in sheets
+        ])
+
+        # Sheets a concurrent upload stored first count as duplicates too
+        for unit, result in zip(sheets, stored):
+            if result is None:
+                known[unit["hash"]] = unit["date"]
+                continue
+            rows_added, rows_removed = result
+            unit.update(status="success", rows_processed=len(unit["transactions"]), rows_added=rows_added, rows_removed=rows_removed)
+
+        results = []
+        for unit in units:
+            if unit["hash"] in known:
+                unit.update(status="duplicate", date=known[unit["hash"]], rows_processed=0, rows_added=0, rows_removed=0)
+            results.append({key: unit[key] for key in ("file", "sheet", "date", "status", "rows_processed", "rows_added", "rows_removed")})
+
+        rows_processed = sum(result["rows_processed"] for result in results)
+        log_event(
+            logging.INFO, "batch stored", files=len(files), sheets=len(units) - len(known),
+            duplicates=len(known), rows=rows_processed
+        )
+
+        return {
+            "status": "success",
+            "rows_processed": rows_processed,
+            "sheets": results
+        }
+
+    except HTTPException:
+        raise
+    except SheetDateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("batch upload failed", extra={"fields": {"files": [file.filename for file in files]}})
+        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+
+# Get progress of a background upload job
+@app.get("/api/upload/{job_id}")
+@run_in_db_pool
+def get_upload_job(job_id: str):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = "SELECT * FROM transactions"
+    cursor.execute('''
+    SELECT id as job_id, filename, status, date, rows_total, rows_processed, error, created_at, started_at, finished_at
+    FROM upload_jobs
+    WHERE id = ?
+    ''', (job_id,))
+
+    job = dict(cursor.fetchone() or {})
+    conn.close()
+
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Upload job {job_id} not found")
+
+    # Throughput since the job started, up to now or until it finished
+    job['rows_per_second'] = 0
+    if job['started_at']:
+        end = datetime.fromisoformat(job['finished_at']) if job['finished_at'] else datetime.now()
+        elapsed = (end - datetime.fromisoformat(job['started_at'])).total_seconds()
+        if elapsed > 0:
+            job['rows_per_second'] = round(job['rows_processed'] / elapsed, 1)
+
+    return job
+
+MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+# Close every month up to and including `month`: its rows move to
+# transactions_archive and leave per-month, per-customer totals behind in
+# customer_month_summaries. Sales still unpaid at the close stay live, with
+# their unpaid amount recorded in opening_sales so allocation carries on exactly.
+def close_months(month):
+    cutoff = month_after(month)
+    conn = get_db_connection()
+    try:
+        with conn:
+            # Hold the write lock from the first read, so an upload cannot land
+            # in the month between the allocation snapshot and the archive
+            conn.execute("BEGIN IMMEDIATE")
+            previous = closed_before(conn)
+            if previous and cutoff <= previous:
+                raise HTTPException(status_code=409, detail=f"{month} is already closed")
+
+            customers = [row[0] for row in conn.execute(
+                "SELECT DISTINCT customer_id FROM transactions WHERE date < ?", (cutoff,)
+            )]
+
+            # Allocation state at the cutoff, from the rows before it
+            kept = []
+            openings = []
+            for customer in customers:
+                _, remaining, _, credit, open_sales = allocate_customer(conn, customer, before=cutoff)
+                kept += [(sale_id, customer, remaining[sale_id]) for sale_id in open_sales]
+                openings.append((customer, credit))
+
+            kept_ids = json.dumps([sale_id for sale_id, _, _ in kept])
+            archived = "date < ? AND id NOT IN (SELECT value FROM json_each(?))"
+            conn.execute(f'''
+            INSERT INTO customer_month_summaries
+            (customer_id, month, transactions, sales, cash, hdfc, gpay, payment, outstanding, repaid, first_date, last_date)
+            SELECT 
+                customer_id,
+                substr(date, 1, 7),
+                COUNT(*),
+                SUM(sales),
+                SUM(cash),
+                SUM(hdfc),
+                SUM(gpay),
+                SUM(payment),
+                SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END),
+                SUM(CASE WHEN transaction_type = 'repayment' THEN (cash + hdfc + gpay) ELSE 0 END),
+                MIN(date),
+                MAX(date)
+            FROM transactions
+            WHERE {archived}
+            GROUP BY customer_id, substr(date, 1, 7)
+            ON CONFLICT (customer_id, month) DO UPDATE SET
+                transactions = transactions + excluded.transactions,
+                sales = sales + excluded.sales,
+                cash = cash + excluded.cash,
+                hdfc = hdfc + excluded.hdfc,
+                gpay = gpay + excluded.gpay,
+                payment = payment + excluded.payment,
+                outstanding = outstanding + excluded.outstanding,
+                repaid = repaid + excluded.repaid,
+                first_date = MIN(first_date, excluded.first_date),
+                last_date = MAX(last_date, excluded.last_date)
+            ''', (cutoff, kept_ids))
+            conn.execute(f"INSERT INTO transactions_archive SELECT * FROM transactions WHERE {archived}", (cutoff, kept_ids))
+            rows_archived = conn.execute(f"DELETE FROM transactions WHERE {archived}", (cutoff, kept_ids)).rowcount
+
+            conn.executemany("DELETE FROM opening_sales WHERE customer_id = ?", [(customer,) for customer in customers])
+            conn.executemany("INSERT INTO opening_sales (id, customer_id, open_amount) VALUES (?, ?, ?)", kept)
+            conn.executemany("INSERT OR REPLACE INTO customer_openings (customer_id, credit) VALUES (?, ?)", openings)
+            conn.execute(
+                "INSERT INTO month_closes (month, rows_archived, rows_kept_open, closed_at) VALUES (?, ?, ?, ?)",
+                (month, rows_archived, len(kept), datetime.now().isoformat())
+            )
+
+            refresh_customer_balances(conn, customers)
+            bump_data_version(conn)
+    finally:
+        conn.close()
+
+    log_event(logging.INFO, "months closed", month=month, rows_archived=rows_archived, rows_kept_open=len(kept))
+    return {
+        "month": month,
+        "closed_before": cutoff,
+        "rows_archived": rows_archived,
+        "rows_kept_open": len(kept),
+        "customers": len(customers)
+    }
+
+# Close a finished month and every month before it
+@app.post("/api/periods/{month}/close")
+@run_in_db_pool
+def close_period(month: str):
+    if not MONTH_PATTERN.match(month):
+        raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+    if month_after(month) > aging_today():
+        raise HTTPException(status_code=400, detail=f"{month} has not finished yet")
+    return close_months(month)
+
+# List closed months, newest first
+@app.get("/api/periods")
+@run_in_db_pool
+def get_periods():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT month, rows_archived, rows_kept_open, closed_at FROM month_closes ORDER BY month DESC")
+    closes = [dict(row) for row in cursor.fetchall()]
+
+    cutoff = closed_before(conn)
+    conn.close()
+    return {"closed_before": cutoff, "closes": closes}
+
+# Columns a client may select with `fields=`
+TRANSACTION_FIELDS = ['id', 'date', 'customer_name', 'sales', 'cash', 'hdfc', 'gpay', 'payment', 'transaction_type', 'outstanding', 'related_credit_id', 'open_amount', 'customer_id']
+
+# Largest page a client may ask for
+MAX_PAGE_SIZE = 1000
+
+def parse_fields(fields):
+    if not fields:
+        return TRANSACTION_FIELDS
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in TRANSACTION_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+# Select a transaction field, converting amounts from paise to rupees
+def select_field(field):
+    if field in MONEY_COLUMNS:
+        return f"{field} / 100.0 AS {field}"
+    return field
+
+# Cursors are "<date>:<id>" of the last row on the previous page
+def parse_cursor(cursor):
+    try:
+        date, row_id = cursor.rsplit(":", 1)
+        return date, int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Query transactions newest first, one keyset page at a time when a limit is given.
+# The cursor for the next page is returned in the X-Next-Cursor header. Rows of
+# closed months are only read when include_archived is set.
+def fetch_transactions(conditions, params, fields=None, limit=None, cursor=None, include_archived=False, format="rows"):
+    check_response_format(format)
+    columns = parse_fields(fields)
+    # The keyset needs date and id even when the client did not ask for them
+    select_columns = list(dict.fromkeys(columns + ['date', 'id'])) if limit else columns
+
+    conditions = list(conditions)
+    params = list(params)
+
+    if cursor:
+        conditions.append("(date, id) < (?, ?)")
+        params.extend(parse_cursor(cursor))
+
+    source = "all_transactions" if include_archived else "transactions"
+    query = f"SELECT {', '.join(map(select_field, select_columns))} FROM {source}"
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    query += " ORDER BY date DESC, id DESC"
+
+    if limit:
+        # Read one row past the page to learn whether another page exists
+        query += " LIMIT ?"
+        params.append(limit + 1)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+
+    conn.close()
+
+    headers = {}
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers["X-Next-Cursor"] = f"{last['date']}:{last['id']}"
+
+    if format == "columnar":
+        content = to_columns(rows, columns)
+    elif select_columns == columns:
+        content = [dict(row) for row in rows]
+    else:
+        content = [{column: row[column] for column in columns} for row in rows]
+    return FastJSONResponse(content, headers=headers)
+
+# Build WHERE conditions shared by the transaction list and export endpoints
+def transaction_filters(from_date=None, to_date=None, customer_name=None, transaction_type=None):
     conditions = []
     params = []
 
@@ -201,161 +2075,262 @@ async def get_transactions(
         params.append(to_date)
 
     if customer_name:
-        conditions.append("customer_name = ?")
-        params.append(customer_name)
+        conditions.append(CUSTOMER_ID_BY_NAME)
+        params.append(normalize_customer_name(customer_name))
 
     if transaction_type:
         conditions.append("transaction_type = ?")
         params.append(transaction_type)
 
+    return conditions, params
+
+# Get all transactions
+@app.get("/api/transactions")
+@run_in_db_pool
+def get_transactions(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    format: str = "rows"
+):    
+    conditions, params = transaction_filters(from_date, to_date, customer_name, transaction_type)
+    return fetch_transactions(conditions, params, fields, limit, cursor, include_archived, format)
+
+# Get transactions by date
+@app.get("/api/transactions/date/{date}")
+@run_in_db_pool
+def get_transactions_by_date(
+    date: str,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    format: str = "rows"
+):
+    return fetch_transactions(["date = ?"], [date], fields, limit, cursor, include_archived, format)
+
+# Get transactions by customer
+@app.get("/api/transactions/customer/{customer_name}")
+@run_in_db_pool
+def get_transactions_by_customer(
+    customer_name: str,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    format: str = "rows"
+):
+    return fetch_transactions(
+        [CUSTOMER_ID_BY_NAME], [normalize_customer_name(customer_name)], fields, limit, cursor, include_archived, format
+    )
+
+# Rows pulled from the cursor per chunk of an export stream
+EXPORT_BATCH_SIZE = 1000
+
+# Yield export chunks straight from the SQLite cursor so memory stays bounded
+def stream_transactions(query, params, columns, export_format):
+    # Chunks may be pulled on different threadpool threads, so the stream
+    # gets its own connection rather than a thread's cached one
+    conn = open_db_connection(check_same_thread=False)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+
+            if export_format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                yield buffer.getvalue()
+            else:
+                yield b"".join(dump_json(dict(row)) + b"\n" for row in rows)
+    finally:
+        conn.close()
+
+# Export transactions as NDJSON or CSV
+@app.get("/api/export/transactions")
+async def export_transactions(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = "ndjson",
+    include_archived: bool = False
+):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be one of: ndjson, csv")
+
+    columns = parse_fields(fields)
+    conditions, params = transaction_filters(from_date, to_date, customer_name, transaction_type)
+
+    source = "all_transactions" if include_archived else "transactions"
+    query = f"SELECT {', '.join(map(select_field, columns))} FROM {source}"
+
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
     query += " ORDER BY date DESC, id DESC"
 
-    cursor.execute(query, params)
-    transactions = [dict(row) for row in cursor.fetchall()]
-
-    conn.close()
-    return transactions
-
-# Get transactions by date
-@app.get("/api/transactions/date/{date}")
-async def get_transactions_by_date(date: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if format == "csv":
+        media_type = "text/csv"
+    else:
+        media_type = "application/x-ndjson"
 
-    cursor.execute(
-        "SELECT * FROM transactions WHERE date = ? ORDER BY id DESC",
-        (date,)
+    return StreamingResponse(
+        stream_transactions(query, params, columns, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=transactions.{format}"}
     )
-    transactions = [dict(row) for row in cursor.fetchall()]
 
-    conn.close()
-    return transactions
+# Autocomplete customers by name: names starting with the text first, then names
+# containing it (through the trigram index, which needs at least three characters)
+@app.get("/api/customers/search")
+@run_in_db_pool
+def search_customers(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50)
+):
+    term = normalize_customer_name(q)
+    if not term:
+        return []
 
-# Get transactions by customer
-@app.get("/api/transactions/customer/{customer_name}")
-async def get_transactions_by_customer(customer_name: str):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        "SELECT * FROM transactions WHERE customer_name = ? ORDER BY date DESC, id DESC",
-        (customer_name,)
-    )
-    transactions = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('''
+    SELECT customers.id as customer_id, customers.name as customer_name, customer_balances.total_outstanding / 100.0 as total_outstanding
+    FROM customers
+    JOIN customer_balances ON customer_balances.customer_id = customers.id
+    WHERE customers.normalized_name >= ? AND customers.normalized_name < ?
+    ORDER BY customers.normalized_name
+    LIMIT ?
+    ''', (term, term + "\U0010ffff", limit))
+
+    matches = [dict(row) for row in cursor.fetchall()]
+
+    if len(matches) < limit and len(term) >= 3:
+        cursor.execute('''
+        SELECT customers.id as customer_id, customers.name as customer_name, customer_balances.total_outstanding / 100.0 as total_outstanding
+        FROM customers_fts
+        JOIN customers ON customers.id = customers_fts.rowid
+        JOIN customer_balances ON customer_balances.customer_id = customers.id
+        WHERE customers_fts MATCH ?
+        ORDER BY customers.normalized_name
+        LIMIT ?
+        ''', ('"' + term.replace('"', '""') + '"', limit + len(matches)))
+
+        seen = {match['customer_id'] for match in matches}
+        for row in cursor.fetchall():
+            if len(matches) == limit:
+                break
+            if row['customer_id'] not in seen:
+                matches.append(dict(row))
 
     conn.close()
-    return transactions
+    return matches
 
 # Get all credits (customers with outstanding balances)
 @app.get("/api/credits")
-async def get_credits():
+@run_in_db_pool
+def get_credits():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-    SELECT 
-        customer_name,
-        SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) -
-        SUM(CASE WHEN transaction_type = 'repayment' THEN (cash + hdfc + gpay) ELSE 0 END) as total_outstanding,
-        MIN(date) as first_date,
-        MAX(date) as last_date,
-        JULIANDAY('now') - JULIANDAY(MIN(date)) as days_outstanding
-    FROM transactions
-    GROUP BY customer_name
-    HAVING total_outstanding > 0
-    ORDER BY days_outstanding DESC
+    cursor.execute(f'''
+    SELECT {CREDIT_COLUMNS}
+    FROM customer_balances
+    JOIN customers ON customers.id = customer_balances.customer_id
+    WHERE customer_balances.total_outstanding > 0
+    ORDER BY oldest_open_date
     ''')
 
-    credits = []
-    for row in cursor.fetchall():
-        row_dict = dict(row)
-        
-        # Add status based on days outstanding
-        days = row_dict['days_outstanding']
-        if days > 90:
-            status = "Overdue"
-        elif days > 30:
-            status = "Warning"
-        else:
-            status = "Good"
-        
-        row_dict['status'] = status
-        credits.append(row_dict)
+    credits = [dict(row) for row in cursor.fetchall()]
 
     conn.close()
     return credits
 
 # Get credit details for a specific customer
 @app.get("/api/credits/{customer_name}")
-async def get_credit_details(customer_name: str):
+@run_in_db_pool
+def get_credit_details(customer_name: str):
     conn = get_db_connection()
     cursor = conn.cursor()
 
     # Get customer credit summary
-    cursor.execute('''
-    SELECT 
-        customer_name,
-        SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) -
-        SUM(CASE WHEN transaction_type = 'repayment' THEN (cash + hdfc + gpay) ELSE 0 END) as total_outstanding,
-        MIN(date) as first_date,
-        MAX(date) as last_date,
-        JULIANDAY('now') - JULIANDAY(MIN(date)) as days_outstanding
-    FROM transactions
-    WHERE customer_name = ?
-    GROUP BY customer_name
-    ''', (customer_name,))
+    cursor.execute(f'''
+    SELECT {CREDIT_COLUMNS}
+    FROM customer_balances
+    JOIN customers ON customers.id = customer_balances.customer_id
+    WHERE customers.normalized_name = ?
+    ''', (normalize_customer_name(customer_name),))
 
     credit = dict(cursor.fetchone() or {})
+    conn.close()
 
     if not credit:
         raise HTTPException(status_code=404, detail=f"Customer {customer_name} not found")
 
-    # Add status based on days outstanding
-    days = credit.get('days_outstanding', 0)
-    if days > 90:
-        status = "Overdue"
-    elif days > 30:
-        status = "Warning"
-    else:
-        status = "Good"
-
-    credit['status'] = status
-
-    conn.close()
     return credit
 
 # Get payment timeline for a customer
 @app.get("/api/credits/{customer_name}/timeline")
-async def get_credit_timeline(customer_name: str):
+@run_in_db_pool
+def get_credit_timeline(customer_name: str):
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    name = normalize_customer_name(customer_name)
+
     # Get timeline data
-    cursor.execute('''
+    cursor.execute(f'''
     SELECT 
         date,
         SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) -
         SUM(CASE WHEN transaction_type = 'repayment' THEN (cash + hdfc + gpay) ELSE 0 END) as balance
     FROM transactions
-    WHERE customer_name = ?
+    WHERE {CUSTOMER_ID_BY_NAME}
     GROUP BY date
     ORDER BY date
-    ''', (customer_name,))
+    ''', (name,))
+    balances = {row['date']: row['balance'] for row in cursor.fetchall()}
 
-    timeline = [dict(row) for row in cursor.fetchall()]
+    # Closed months add one point each, on their last day
+    cursor.execute(f"SELECT last_date, outstanding - repaid AS balance FROM customer_month_summaries WHERE {CUSTOMER_ID_BY_NAME}", (name,))
+    for row in cursor.fetchall():
+        balances[row['last_date']] = balances.get(row['last_date'], 0) + row['balance']
+
+    timeline = [{"date": date, "balance": balances[date] / 100} for date in sorted(balances)]
 
     # Get payment method breakdown
-    cursor.execute('''
+    cursor.execute(f'''
     SELECT 
         SUM(cash) as cash_total,
         SUM(hdfc) as hdfc_total,
         SUM(gpay) as gpay_total
-    FROM transactions
-    WHERE customer_name = ? AND (cash > 0 OR hdfc > 0 OR gpay > 0)
-    ''', (customer_name,))
+    FROM (
+        SELECT cash, hdfc, gpay FROM transactions
+        WHERE {CUSTOMER_ID_BY_NAME} AND (cash > 0 OR hdfc > 0 OR gpay > 0)
+        UNION ALL
+        SELECT cash, hdfc, gpay FROM customer_month_summaries
+        WHERE {CUSTOMER_ID_BY_NAME}
+    )
+    ''', (name, name))
 
     payment_totals = dict(cursor.fetchone() or {})
 
@@ -383,24 +2358,25 @@ async def get_credit_timeline(customer_name: str):
 
 # Get daily summary for a specific date
 @app.get("/api/reports/daily/{date}")
-async def get_daily_summary(date: str):
+@run_in_db_pool
+def get_daily_summary(date: str):
     conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute('''
     SELECT 
-        ? as date,
-        SUM(CASE WHEN transaction_type = 'sale' THEN sales ELSE 0 END) as total_sales,
-        SUM(cash) as total_cash,
-        SUM(hdfc) as total_hdfc,
-        SUM(gpay) as total_gpay,
-        SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as total_payment,
-        SUM(cash) + SUM(hdfc) + SUM(gpay) as total_received,
-        SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) as total_outstanding,
-        (SUM(cash) + SUM(hdfc) + SUM(gpay)) - SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as net_cash_flow
-    FROM transactions
+        date,
+        total_sales / 100.0 as total_sales,
+        total_cash / 100.0 as total_cash,
+        total_hdfc / 100.0 as total_hdfc,
+        total_gpay / 100.0 as total_gpay,
+        total_expenses / 100.0 as total_payment,
+        (total_cash + total_hdfc + total_gpay) / 100.0 as total_received,
+        total_outstanding / 100.0 as total_outstanding,
+        net_cash_flow / 100.0 as net_cash_flow
+    FROM daily_rollups
     WHERE date = ?
-    ''', (date, date))
+    ''', (date,))
 
     summary = dict(cursor.fetchone() or {})
 
@@ -423,17 +2399,22 @@ async def get_daily_summary(date: str):
 
 # Get chart data for a specific date
 @app.get("/api/reports/daily/{date}/charts")
-async def get_daily_charts(date: str):
+@run_in_db_pool
+def get_daily_charts(date: str):
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    # Dates in closed months can have rows in the archive too
+    cutoff = closed_before(conn)
+    source = "all_transactions" if cutoff and date < cutoff else "transactions"
+
     # Get payment method distribution
-    cursor.execute('''
+    cursor.execute(f'''
     SELECT 
-        SUM(cash) as cash_total,
-        SUM(hdfc) as hdfc_total,
-        SUM(gpay) as gpay_total
-    FROM transactions
+        SUM(cash) / 100.0 as cash_total,
+        SUM(hdfc) / 100.0 as hdfc_total,
+        SUM(gpay) / 100.0 as gpay_total
+    FROM {source}
     WHERE date = ? AND (cash > 0 OR hdfc > 0 OR gpay > 0)
     ''', (date,))
 
@@ -457,11 +2438,11 @@ async def get_daily_charts(date: str):
                 })
 
     # Get transaction type distribution
-    cursor.execute('''
+    cursor.execute(f'''
     SELECT 
         transaction_type,
         COUNT(*) as count
-    FROM transactions
+    FROM {source}
     WHERE date = ?
     GROUP BY transaction_type
     ''', (date,))
@@ -488,22 +2469,24 @@ async def get_daily_charts(date: str):
 
 # Get list of all daily reports
 @app.get("/api/reports/daily")
-async def get_daily_reports(
+@run_in_db_pool
+def get_daily_reports(
     from_date: Optional[str] = None,
-    to_date: Optional[str] = None
+    to_date: Optional[str] = None,
+    format: str = "rows"
 ):
-    
+    check_response_format(format)
     conn = get_db_connection()
     cursor = conn.cursor()
 
     query = '''
     SELECT 
         date,
-        SUM(CASE WHEN transaction_type = 'sale' THEN sales ELSE 0 END) as total_sales,
-        SUM(cash) + SUM(hdfc) + SUM(gpay) as total_received,
-        SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as total_expenses,
-        (SUM(cash) + SUM(hdfc) + SUM(gpay)) - SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as net_cash_flow
-    FROM transactions
+        total_sales / 100.0 as total_sales,
+        (total_cash + total_hdfc + total_gpay) / 100.0 as total_received,
+        total_expenses / 100.0 as total_expenses,
+        net_cash_flow / 100.0 as net_cash_flow
+    FROM daily_rollups
     '''
 
     conditions = []
@@ -520,48 +2503,46 @@ async def get_daily_reports(
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    query += " GROUP BY date ORDER BY date DESC"
+    query += " ORDER BY date DESC"
 
     cursor.execute(query, params)
-    reports = [dict(row) for row in cursor.fetchall()]
+    rows = cursor.fetchall()
+    columns = [column[0] for column in cursor.description]
 
     conn.close()
-    return reports
+    if format == "columnar":
+        return FastJSONResponse(to_columns(rows, columns))
+    return FastJSONResponse([dict(row) for row in rows])
 
 # Get latest daily summary
 @app.get("/api/reports/latest")
-async def get_latest_summary():
+@run_in_db_pool
+def get_latest_summary():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Get the latest date
-    cursor.execute("SELECT MAX(date) as latest_date FROM transactions")
-    latest_date = cursor.fetchone()['latest_date']
-
-    if not latest_date:
-        return None
-
-    # Get summary for the latest date
     cursor.execute('''
     SELECT 
-        ? as date,
-        SUM(CASE WHEN transaction_type = 'sale' THEN sales ELSE 0 END) as total_sales,
-        SUM(cash) + SUM(hdfc) + SUM(gpay) as total_received,
-        SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) as total_outstanding,
-        SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as total_expenses,
-        (SUM(cash) + SUM(hdfc) + SUM(gpay)) - SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as net_cash_flow
-    FROM transactions
-    WHERE date = ?
-    ''', (latest_date, latest_date))
+        date,
+        total_sales / 100.0 as total_sales,
+        (total_cash + total_hdfc + total_gpay) / 100.0 as total_received,
+        total_outstanding / 100.0 as total_outstanding,
+        total_expenses / 100.0 as total_expenses,
+        net_cash_flow / 100.0 as net_cash_flow
+    FROM daily_rollups
+    ORDER BY date DESC
+    LIMIT 1
+    ''')
 
-    summary = dict(cursor.fetchone() or {})
+    row = cursor.fetchone()
 
     conn.close()
-    return summary
+    return dict(row) if row else None
 
 # Get summary statistics for a date range
 @app.get("/api/reports/summary")
-async def get_summary_stats(
+@run_in_db_pool
+def get_summary_stats(
     from_date: Optional[str] = None,
     to_date: Optional[str] = None
 ):
@@ -571,11 +2552,11 @@ async def get_summary_stats(
 
     query = '''
     SELECT 
-        SUM(CASE WHEN transaction_type = 'sale' THEN sales ELSE 0 END) as total_sales,
-        SUM(cash) + SUM(hdfc) + SUM(gpay) as total_received,
-        SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as total_expenses,
-        (SUM(cash) + SUM(hdfc) + SUM(gpay)) - SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as net_cash_flow
-    FROM transactions
+        SUM(total_sales) / 100.0 as total_sales,
+        (SUM(total_cash) + SUM(total_hdfc) + SUM(total_gpay)) / 100.0 as total_received,
+        SUM(total_expenses) / 100.0 as total_expenses,
+        SUM(net_cash_flow) / 100.0 as net_cash_flow
+    FROM daily_rollups
     '''
 
     conditions = []
@@ -598,9 +2579,8 @@ async def get_summary_stats(
     # Get total outstanding (current)
     cursor.execute('''
     SELECT 
-        SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) -
-        SUM(CASE WHEN transaction_type = 'repayment' THEN (cash + hdfc + gpay) ELSE 0 END) as total_outstanding
-    FROM transactions
+        (SUM(total_outstanding) - SUM(total_repaid)) / 100.0 as total_outstanding
+    FROM daily_rollups
     ''')
 
     outstanding = cursor.fetchone()['total_outstanding'] or 0
@@ -615,36 +2595,121 @@ async def get_summary_stats(
     conn.close()
     return stats
 
+# Get the receivables aging report: open sale amounts per customer in 0-30,
+# 31-60, 61-90 and 90+ day buckets, with totals per bucket. Read-only: the
+# buckets are rolled forward by the daily scheduler and the first upload of a day.
+@app.get("/api/reports/aging")
+@run_in_db_pool
+def get_aging_report(customer_name: Optional[str] = None):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT as_of FROM aging_state WHERE id = 1")
+    as_of = cursor.fetchone()['as_of']
+
+    labels = [label for label, _ in AGING_BUCKETS]
+    columns = ", ".join(
+        f"SUM(CASE WHEN bucket = '{label}' THEN open_amount ELSE 0 END) as \"{label}\""
+        for label in labels
+    )
+
+    query = f'''
+    SELECT customers.id as customer_id, customers.name as customer_name, {columns}, SUM(open_amount) as total
+    FROM customer_aging
+    JOIN customers ON customers.id = customer_aging.customer_id
+    '''
+    params = []
+
+    if customer_name:
+        query += " WHERE customers.normalized_name = ?"
+        params.append(normalize_customer_name(customer_name))
+
+    query += " GROUP BY customer_aging.customer_id ORDER BY total DESC, customers.name"
+
+    cursor.execute(query, params)
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    # Totals are summed in paise and converted once
+    buckets = {label: sum(row[label] for row in rows) for label in labels}
+    customers = [dict(row, **{column: row[column] / 100 for column in labels + ['total']}) for row in rows]
+
+    return {
+        "as_of": as_of,
+        "buckets": {label: amount / 100 for label, amount in buckets.items()},
+        "total": sum(buckets.values()) / 100,
+        "customers": customers
+    }
+
+# SQL expressions mapping a transaction date to the start of its chart bucket
+CHART_BUCKETS = {
+    "day": "date",
+    "week": "date(date, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m-01', date)"
+}
+
+# Python counterpart of CHART_BUCKETS, used to zero-fill empty buckets
+def bucket_start(day, bucket):
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def next_bucket(day, bucket):
+    if bucket == "week":
+        return day + timedelta(days=7)
+    if bucket == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
 # Get chart data for reports
 @app.get("/api/reports/charts")
-async def get_chart_data (
+@run_in_db_pool
+def get_chart_data (
     from_date: Optional[str] = None,
-    to_date: Optional[str] = None
+    to_date: Optional[str] = None,
+    bucket: str = "day"
 ):
-    
+    if bucket not in CHART_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(CHART_BUCKETS)}")
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     # Determine date range
-    if not from_date:
-        cursor.execute("SELECT MIN(date) as min_date FROM transactions")
-        from_date = cursor.fetchone()['min_date']
+    if not from_date or not to_date:
+        cursor.execute("SELECT MIN(date) as min_date, MAX(date) as max_date FROM daily_rollups")
+        bounds = cursor.fetchone()
+        from_date = from_date or bounds['min_date']
+        to_date = to_date or bounds['max_date']
 
-    if not to_date:
-        cursor.execute("SELECT MAX(date) as max_date FROM transactions")
-        to_date = cursor.fetchone()['max_date']
+    if not from_date or not to_date:
+        conn.close()
+        return FastJSONResponse(chart_series({}, from_date, to_date, bucket))
 
-    # Get all dates in range
-    date_range = []
-    start_date = datetime.strptime(from_date, "%Y-%m-%d")
-    end_date = datetime.strptime(to_date, "%Y-%m-%d")
+    # Aggregate the whole range in one grouped query
+    cursor.execute(f'''
+    SELECT 
+        {CHART_BUCKETS[bucket]} as bucket,
+        SUM(total_sales) / 100.0 as total_sales,
+        (SUM(total_cash) + SUM(total_hdfc) + SUM(total_gpay)) / 100.0 as total_received,
+        SUM(total_expenses) / 100.0 as total_expenses,
+        SUM(total_outstanding) / 100.0 as total_outstanding,
+        SUM(net_cash_flow) / 100.0 as net_cash_flow
+    FROM daily_rollups
+    WHERE date >= ? AND date <= ?
+    GROUP BY bucket
+    ''', (from_date, to_date))
+
+    rows = {row['bucket']: dict(row) for row in cursor.fetchall()}
+    conn.close()
 
-    current_date = start_date
-    while current_date <= end_date:
-        date_range.append(current_date.strftime("%Y-%m-%d"))
-        current_date += timedelta(days=1)
+    return FastJSONResponse(chart_series(rows, from_date, to_date, bucket))
 
-    # Get data for each date
+# Lay out per-bucket totals (keyed by bucket start) as chart series, walking
+# every bucket in the range and filling gaps with zeros
+def chart_series(rows, from_date, to_date, bucket):
     dates = []
     sales = []
     received = []
@@ -652,28 +2717,23 @@ async def get_chart_data (
     outstanding = []
     net_cash_flow = []
 
-    for date in date_range:
-        cursor.execute('''
-        SELECT 
-            SUM(CASE WHEN transaction_type = 'sale' THEN sales ELSE 0 END) as total_sales,
-            SUM(cash) + SUM(hdfc) + SUM(gpay) as total_received,
-            SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as total_expenses,
-            SUM(CASE WHEN transaction_type = 'sale' THEN outstanding ELSE 0 END) as total_outstanding,
-            (SUM(cash) + SUM(hdfc) + SUM(gpay)) - SUM(CASE WHEN transaction_type = 'expense' THEN payment ELSE 0 END) as net_cash_flow
-        FROM transactions
-        WHERE date = ?
-        ''', (date,))
-        
-        row = dict(cursor.fetchone() or {})
-        
-        dates.append(date)
-        sales.append(row.get('total_sales') or 0)
-        received.append(row.get('total_received') or 0)
-        expenses.append(row.get('total_expenses') or 0)
-        outstanding.append(row.get('total_outstanding') or 0)
-        net_cash_flow.append(row.get('net_cash_flow') or 0)
+    if from_date and to_date:
+        current = bucket_start(datetime.strptime(from_date, "%Y-%m-%d"), bucket)
+        end_date = datetime.strptime(to_date, "%Y-%m-%d")
+
+        while current <= end_date:
+            key = current.strftime("%Y-%m-%d")
+            row = rows.get(key, {})
+
+            dates.append(key)
+            sales.append(row.get('total_sales') or 0)
+            received.append(row.get('total_received') or 0)
+            expenses.append(row.get('total_expenses') or 0)
+            outstanding.append(row.get('total_outstanding') or 0)
+            net_cash_flow.append(row.get('net_cash_flow') or 0)
+
+            current = next_bucket(current, bucket)
 
-    conn.close()
     return {
         "dates": dates,
         "sales": sales,
@@ -683,7 +2743,169 @@ async def get_chart_data (
         "net_cash_flow": net_cash_flow
     }
 
-# Run the application
+# Get every home-page panel in one round-trip: latest day, summary stats, chart
+# series, daily reports and credits. All panels are built from one read of
+# daily_rollups and one of customer_balances inside a single read transaction,
+# so they agree with each other even while an upload is committing.
+@app.get("/api/dashboard")
+@run_in_db_pool
+def get_dashboard(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    bucket: str = "day"
+):
+    if bucket not in CHART_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(CHART_BUCKETS)}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("BEGIN")
+    cursor.execute(f'''
+    SELECT 
+        date,
+        {CHART_BUCKETS[bucket]} as bucket,
+        total_sales,
+        total_cash + total_hdfc + total_gpay as total_received,
+        total_expenses,
+        total_outstanding,
+        total_repaid,
+        net_cash_flow
+    FROM daily_rollups
+    ORDER BY date
+    ''')
+    days = [dict(row) for row in cursor.fetchall()]
+
+    cursor.execute(f'''
+    SELECT {CREDIT_COLUMNS}
+    FROM customer_balances
+    JOIN customers ON customers.id = customer_balances.customer_id
+    WHERE customer_balances.total_outstanding > 0
+    ORDER BY oldest_open_date
+    ''')
+    credits = [dict(row) for row in cursor.fetchall()]
+
+    conn.close()
+
+    # Everything below works on paise and converts each figure once
+    in_range = [
+        day for day in days
+        if (not from_date or day['date'] >= from_date) and (not to_date or day['date'] <= to_date)
+    ]
+
+    latest = None
+    if days:
+        last = days[-1]
+        latest = {
+            "date": last['date'],
+            "total_sales": last['total_sales'] / 100,
+            "total_received": last['total_received'] / 100,
+            "total_outstanding": last['total_outstanding'] / 100,
+            "total_expenses": last['total_expenses'] / 100,
+            "net_cash_flow": last['net_cash_flow'] / 100
+        }
+
+    daily = [
+        {
+            "date": day['date'],
+            "total_sales": day['total_sales'] / 100,
+            "total_received": day['total_received'] / 100,
+            "total_expenses": day['total_expenses'] / 100,
+            "net_cash_flow": day['net_cash_flow'] / 100
+        }
+        for day in reversed(in_range)
+    ]
+
+    summary = {
+        column: sum(day[column] for day in in_range) / 100 if in_range else None
+        for column in ('total_sales', 'total_received', 'total_expenses', 'net_cash_flow')
+    }
+    summary['total_outstanding'] = sum(day['total_outstanding'] - day['total_repaid'] for day in days) / 100
+    summary['date_range'] = {
+        "from": from_date or "all",
+        "to": to_date or "all"
+    }
+
+    # Charts default to the full span of stored days, like /api/reports/charts
+    chart_from = from_date or (days[0]['date'] if days else None)
+    chart_to = to_date or (days[-1]['date'] if days else None)
+    buckets = {}
+    if chart_from and chart_to:
+        for day in days:
+            if not chart_from <= day['date'] <= chart_to:
+                continue
+            totals = buckets.setdefault(day['bucket'], Counter())
+            for column in ('total_sales', 'total_received', 'total_expenses', 'total_outstanding', 'net_cash_flow'):
+                totals[column] += day[column]
+    rows = {key: {column: amount / 100 for column, amount in totals.items()} for key, totals in buckets.items()}
+
+    return FastJSONResponse({
+        "latest": latest,
+        "summary": summary,
+        "charts": chart_series(rows, chart_from, chart_to, bucket),
+        "daily": daily,
+        "credits": credits
+    })
+
+# Configured stores; requests pick one with the X-Store header or a /stores/{store} prefix
+@app.get("/api/stores")
+async def get_stores():
+    return {"default": DEFAULT_STORE, "stores": STORES}
+
+# Run an async route handler against every store in parallel, keyed by store
+async def fan_out(handler, *args, **kwargs):
+    async def in_store(store):
+        current_store.set(store)
+        return await handler(*args, **kwargs)
+    return dict(zip(STORES, await asyncio.gather(*[in_store(store) for store in STORES])))
+
+SUMMARY_TOTALS = ['total_sales', 'total_received', 'total_expenses', 'net_cash_flow', 'total_outstanding']
+
+# Summary statistics across all stores, with each store's own figures
+@app.get("/api/group/reports/summary")
+async def get_group_summary(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None
+):
+    by_store = await fan_out(get_summary_stats, from_date=from_date, to_date=to_date)
+    stats = {
+        field: round(sum(summary[field] or 0 for summary in by_store.values()), 2)
+        for field in SUMMARY_TOTALS
+    }
+    stats['date_range'] = {"from": from_date or "all", "to": to_date or "all"}
+    stats['stores'] = by_store
+    return stats
+
+# Customers with outstanding balances in any store, oldest unpaid sale first.
+# Customer ids are per store, so each row names its store.
+@app.get("/api/group/credits")
+async def get_group_credits():
+    by_store = await fan_out(get_credits)
+    credits = [dict(credit, store=store) for store, rows in by_store.items() for credit in rows]
+    credits.sort(key=lambda credit: credit['oldest_open_date'] or "")
+    return credits
+
+# Prometheus scrape endpoint for request, query and cache metrics
+@app.get("/metrics")
+async def get_metrics():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return Response(content="\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+# Run the application, or rebuild every store's derived tables with `python main.py rebuild-rollups`
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    if sys.argv[1:] == ["rebuild-rollups"]:
+        for store in STORES:
+            current_store.set(store)
+            init_db()
+            conn = get_db_connection()
+            with conn:
+                refresh_daily_rollups(conn)
+                refresh_customer_balances(conn)
+                bump_data_version(conn)
+            conn.close()
+            print(f"{store}: daily_rollups and customer_balances rebuilt")
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
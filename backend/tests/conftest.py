@@ -0,0 +1,44 @@
+import io
+import os
+import sys
+from datetime import date
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CREDIT_LOG_LEVEL", "OFF")
+
+import main
+
+SHEET_HEADER = ['Particulars', 'SALES', 'CASH', 'kotak/hdfc', 'G PAY', 'PAYMENT']
+
+# A daily sheet as CSV: rows are (customer, sales, cash, hdfc, gpay, payment),
+# dated by a DATE column header the way the shop's sheets are
+def sheet_csv(day, rows):
+    stamp = date.fromisoformat(day).strftime("%d-%m-%y") if day else None
+    buffer = io.StringIO()
+    buffer.write(",".join(SHEET_HEADER + ([f"DATE {stamp}"] if stamp else [])) + "\n")
+    for row in rows:
+        buffer.write(",".join(str(value) for value in row) + ("," if stamp else "") + "\n")
+    return buffer.getvalue().encode()
+
+# A fresh database for every test, with the app's lifespan running
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "DB_PATH", str(tmp_path / "transactions.db"))
+    monkeypatch.setattr(main, "STORES_DIR", str(tmp_path / "stores"))
+    main.response_cache.clear()
+    with TestClient(main.app) as client:
+        yield client
+
+# Upload one day's rows through /api/upload and return the JSON response
+@pytest.fixture
+def upload(client):
+    def upload(day, rows, filename="sheet.csv"):
+        response = client.post("/api/upload", files={"file": (filename, sheet_csv(day, rows))})
+        response.raise_for_status()
+        return response.json()
+    return upload
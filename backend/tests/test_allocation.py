@@ -0,0 +1,59 @@
+# Repayments settle a customer's sales oldest first (FIFO)
+
+# A customer's transactions, oldest first
+def customer_rows(client, name):
+    return sorted(client.get(f"/api/transactions/customer/{name}").json(), key=lambda row: (row["date"], row["id"]))
+
+def test_partial_repayment_leaves_the_rest_of_the_sale_open(upload, client):
+    upload("2024-01-01", [("Ravi", 100, 0, 0, 0, 0)])
+    upload("2024-01-02", [("Ravi", 0, 40, 0, 0, 0)])
+
+    sale, repayment = customer_rows(client, "Ravi")
+    assert sale["open_amount"] == 60
+    assert repayment["related_credit_id"] == sale["id"]
+
+    credit = client.get("/api/credits/Ravi").json()
+    assert (credit["total_outstanding"], credit["oldest_open_date"]) == (60, "2024-01-01")
+
+def test_repayment_spanning_several_sales_settles_the_oldest_first(upload, client):
+    upload("2024-01-01", [("Ravi", 100, 0, 0, 0, 0)])
+    upload("2024-01-02", [("Ravi", 50, 0, 0, 0, 0)])
+    upload("2024-01-03", [("Ravi", 30, 0, 0, 0, 0)])
+    upload("2024-01-04", [("Ravi", 0, 70, 50, 0, 0)])
+
+    first, second, third, repayment = customer_rows(client, "Ravi")
+    assert [first["open_amount"], second["open_amount"], third["open_amount"]] == [0, 30, 30]
+    assert repayment["related_credit_id"] == first["id"]
+
+    credit = client.get("/api/credits/Ravi").json()
+    assert (credit["total_outstanding"], credit["oldest_open_date"]) == (60, "2024-01-02")
+
+def test_reupload_without_a_payment_reopens_the_sale(upload, client):
+    upload("2024-01-01", [("Ravi", 100, 0, 0, 0, 0)])
+    upload("2024-01-02", [("Ravi", 0, 100, 0, 0, 0), ("Mani", 20, 0, 0, 0, 0)])
+
+    sale, _ = customer_rows(client, "Ravi")
+    assert sale["open_amount"] == 0
+    assert client.get("/api/credits/Ravi").json()["oldest_open_date"] is None
+
+    result = upload("2024-01-02", [("Mani", 20, 0, 0, 0, 0)])
+    assert result["rows_removed"] == 1
+
+    (sale,) = customer_rows(client, "Ravi")
+    assert sale["open_amount"] == 100
+
+    credit = client.get("/api/credits/Ravi").json()
+    assert (credit["total_outstanding"], credit["oldest_open_date"]) == (100, "2024-01-01")
+
+def test_overpayment_on_a_sale_pays_off_older_sales(upload, client):
+    upload("2024-01-01", [("Ravi", 100, 0, 0, 0, 0)])
+    upload("2024-01-02", [("Ravi", 50, 80, 0, 0, 0)])
+    upload("2024-01-03", [("Ravi", 0, 70, 0, 0, 0)])
+
+    first, second, repayment = customer_rows(client, "Ravi")
+    assert [first["open_amount"], second["open_amount"]] == [0, 0]
+    assert repayment["related_credit_id"] == first["id"]
+
+    credit = client.get("/api/credits/Ravi").json()
+    assert (credit["total_outstanding"], credit["oldest_open_date"], credit["status"]) == (0, None, "Good")
+    assert client.get("/api/reports/aging?customer_name=Ravi").json()["total"] == 0
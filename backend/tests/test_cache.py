@@ -0,0 +1,28 @@
+def test_etag_changes_after_an_upload(upload, client):
+    upload("2024-03-01", [("A", 100, 0, 0, 0, 0)])
+    first = client.get("/api/reports/summary")
+    etag = first.headers["etag"]
+
+    assert client.get("/api/reports/summary", headers={"If-None-Match": etag}).status_code == 304
+
+    upload("2024-03-02", [("A", 50, 0, 0, 0, 0)])
+    second = client.get("/api/reports/summary", headers={"If-None-Match": etag})
+
+    assert second.status_code == 200
+    assert second.headers["etag"] != etag
+    assert second.json()["total_sales"] == 150
+
+def test_weak_etag_of_a_compressed_response_matches(upload, client):
+    upload("2024-03-01", [("A", 100, 0, 0, 0, 0)])
+    etag = client.get("/api/reports/summary").headers["etag"]
+
+    assert client.get("/api/reports/summary", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+def test_matching_etag_still_runs_the_route_for_an_uncached_request(upload, client):
+    upload("2024-03-01", [("A", 100, 0, 0, 0, 0)])
+    etag = client.get("/api/reports/summary").headers["etag"]
+    headers = {"If-None-Match": etag}
+
+    assert client.get("/api/credits/NOBODY", headers=headers).status_code == 404
+    assert client.get("/api/reports/charts?bucket=bad", headers=headers).status_code == 400
+    assert client.get("/api/credits/A", headers=headers).status_code == 304
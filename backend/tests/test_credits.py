@@ -0,0 +1,31 @@
+import main
+
+def test_customer_with_nothing_open_is_not_aged(upload, client):
+    upload("2024-01-01", [("ABBAS", 100, 0, 0, 0, 0)])
+    upload("2024-01-02", [("ABBAS", 0, 100, 0, 0, 0)])
+
+    credit = client.get("/api/credits/ABBAS").json()
+
+    assert credit["total_outstanding"] == 0
+    assert credit["oldest_open_date"] is None
+    assert (credit["days_outstanding"], credit["status"]) == (0, "Good")
+
+def test_customer_is_aged_from_the_oldest_unpaid_sale(upload, client):
+    upload("2024-01-01", [("ABBAS", 100, 0, 0, 0, 0)])
+
+    credit = client.get("/api/credits/ABBAS").json()
+
+    assert credit["oldest_open_date"] == "2024-01-01"
+    assert credit["days_outstanding"] > 90
+    assert credit["status"] == "Overdue"
+
+def test_aging_report_is_read_only_and_uploads_roll_it_forward(upload, client):
+    upload("2024-01-01", [("ABBAS", 100, 0, 0, 0, 0)])
+    conn = main.get_db_connection()
+    with conn:
+        conn.execute("UPDATE aging_state SET as_of = '2024-01-02' WHERE id = 1")
+
+    assert client.get("/api/reports/aging").json()["as_of"] == "2024-01-02"
+
+    upload("2024-01-03", [("OTHER", 10, 0, 0, 0, 0)])
+    assert client.get("/api/reports/aging").json()["as_of"] == main.aging_today()
@@ -0,0 +1,115 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import main
+from conftest import sheet_csv
+
+ROWS = [(f"Customer {i}", 100 + i, i % 7, 0, 0, 0) for i in range(300)]
+
+def test_concurrent_identical_uploads_store_rows_once(client):
+    contents = sheet_csv("2024-03-01", ROWS)
+
+    def post():
+        response = client.post("/api/upload", files={"file": ("01-03-24.csv", contents)})
+        response.raise_for_status()
+        return response.json()["status"]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        statuses = sorted(pool.map(lambda _: post(), range(2)))
+
+    assert statuses == ["duplicate", "success"]
+    assert len(client.get("/api/transactions/date/2024-03-01").json()) == len(ROWS)
+    summary = client.get("/api/reports/summary").json()
+    assert summary["total_sales"] == sum(row[1] for row in ROWS)
+    assert summary["total_outstanding"] == sum(row[1] - row[2] for row in ROWS)
+
+def test_concurrent_identical_batches_store_rows_once(client):
+    contents = sheet_csv("2024-03-02", ROWS)
+
+    def post():
+        response = client.post("/api/upload/batch", files=[("files", ("02-03-24.csv", contents))])
+        response.raise_for_status()
+        return response.json()["sheets"][0]["status"]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        statuses = sorted(pool.map(lambda _: post(), range(2)))
+
+    assert statuses == ["duplicate", "success"]
+    assert len(client.get("/api/transactions/date/2024-03-02").json()) == len(ROWS)
+
+def test_reupload_of_a_changed_sheet_replaces_the_day(upload, client):
+    upload("2024-03-03", [("A", 100, 0, 0, 0, 0), ("B", 50, 0, 0, 0, 0)])
+    result = upload("2024-03-03", [("A", 100, 0, 0, 0, 0), ("C", 70, 0, 0, 0, 0)])
+
+    assert (result["rows_added"], result["rows_removed"]) == (1, 1)
+    names = sorted(row["customer_name"] for row in client.get("/api/transactions/date/2024-03-03").json())
+    assert names == ["A", "C"]
+
+def test_undated_sheet_is_refused_and_keeps_existing_rows(upload, client):
+    today = date.today().isoformat()
+    upload(today, [("A", 100, 0, 0, 0, 0)])
+
+    response = client.post("/api/upload", files={"file": ("sheet.csv", sheet_csv(None, [("B", 50, 0, 0, 0, 0)]))})
+
+    assert response.status_code == 400
+    assert "has no date" in response.json()["detail"]
+    names = [row["customer_name"] for row in client.get(f"/api/transactions/date/{today}").json()]
+    assert names == ["A"]
+
+def test_batch_with_two_sheets_for_one_date_is_refused(client):
+    files = [
+        ("files", ("a.csv", sheet_csv("2024-01-06", [("A", 100, 0, 0, 0, 0)]))),
+        ("files", ("b.csv", sheet_csv("2024-01-06", [("B", 50, 0, 0, 0, 0)]))),
+    ]
+    response = client.post("/api/upload/batch", files=files)
+
+    assert response.status_code == 409
+    assert "2024-01-06: a.csv (a), b.csv (b)" in response.json()["detail"]
+    assert client.get("/api/transactions/date/2024-01-06").json() == []
+
+def test_upload_without_a_date_column_is_dated_by_its_file_name(client):
+    response = client.post("/api/upload", files={"file": ("04-03-24.csv", sheet_csv(None, [("A", 100, 0, 0, 0, 0)]))})
+
+    assert response.status_code == 200
+    assert response.json()["date"] == "2024-03-04"
+    assert len(client.get("/api/transactions/date/2024-03-04").json()) == 1
+
+def test_upload_into_a_closed_month_is_refused(upload, client):
+    upload("2024-01-05", [("A", 100, 0, 0, 0, 0)])
+    assert client.post("/api/periods/2024-01/close").status_code == 200
+
+    response = client.post("/api/upload", files={"file": ("sheet.csv", sheet_csv("2024-01-20", [("B", 50, 0, 0, 0, 0)]))})
+
+    assert response.status_code == 409
+    assert "2024-01-20" in response.json()["detail"]
+    assert client.get("/api/transactions/date/2024-01-20").json() == []
+
+def test_upload_replacing_a_date_during_a_background_job_stops_the_job(client, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_JOB_CHUNK_ROWS", 5)
+    stale = sheet_csv("2024-03-05", ROWS[:40])
+    corrected = sheet_csv("2024-03-05", ROWS[100:110])
+
+    # Store the corrected sheet right after the job's first chunk is committed
+    store_chunk = main.store_upload_job_chunk
+    def store_chunk_then_correct(job_id, chunk, rows_processed, file_hash):
+        stored = store_chunk(job_id, chunk, rows_processed, file_hash)
+        if rows_processed == 5:
+            transactions, date_iso = main.read_sheet(corrected, "05-03-24.csv")
+            main.store_sheet(transactions, date_iso, hashlib.sha256(corrected).hexdigest(), "05-03-24.csv")
+        return stored
+    monkeypatch.setattr(main, "store_upload_job_chunk", store_chunk_then_correct)
+
+    job_id = client.post("/api/upload?background=true", files={"file": ("05-03-24.csv", stale)}).json()["job_id"]
+    for _ in range(100):
+        job = client.get(f"/api/upload/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+
+    assert job["status"] == "failed"
+    assert "changed by another upload" in job["error"]
+    rows = client.get("/api/transactions/date/2024-03-05").json()
+    assert sorted(row["customer_name"] for row in rows) == sorted(row[0] for row in ROWS[100:110])
+    assert main.find_uploaded_file(hashlib.sha256(corrected).hexdigest())["rows"] == 10